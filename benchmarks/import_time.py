@@ -0,0 +1,49 @@
+"""Measure the import time of the codec modules and of NetflowSource.
+
+Each import runs in a fresh interpreter and is repeated several times; the
+best time is reported together with whether intake or dask got loaded.
+
+Usage::
+
+    python benchmarks/import_time.py [repeat]
+"""
+
+import subprocess
+import sys
+
+
+STATEMENTS = [
+    'import intake_netflow',
+    'import intake_netflow.v9',
+    'import intake_netflow.dispatch',
+    'import intake_netflow.pcap',
+    'from intake_netflow import NetflowSource',
+]
+
+SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+{}
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in ('intake', 'dask') if m in sys.modules)
+print(elapsed, ','.join(heavy))
+'''
+
+
+def measure(statement, repeat=5):
+    best, heavy = float('inf'), ''
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', SCRIPT.format(statement)])
+        elapsed, _, heavy = out.decode().strip().partition(' ')
+        best = min(best, float(elapsed))
+    return best, heavy
+
+
+def main(repeat=5):
+    for statement in STATEMENTS:
+        best, heavy = measure(statement, repeat)
+        print('{:45s} {:8.1f} ms  {}'.format(statement, best * 1000, heavy or '-'))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
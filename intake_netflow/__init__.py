@@ -1,8 +1,25 @@
+import sys
 
 from ._version import get_versions
 __version__ = get_versions()['version']
 del get_versions
 
-import intake  # Import this first to avoid circular imports during discovery.
-del intake
-from .source import NetflowSource
+
+def _import_source():
+    import intake  # Import this first to avoid circular imports during discovery.
+    del intake
+    from .source import NetflowSource
+    return NetflowSource
+
+
+# The codec modules (v5, v9, dispatch, pcap, nfcapd) are importable without
+# intake and dask; those are only loaded once NetflowSource is accessed.
+# Python 3.6 has no module __getattr__ (PEP 562), so the source is imported
+# up front there.
+if sys.version_info < (3, 7):
+    NetflowSource = _import_source()
+else:
+    def __getattr__(name):
+        if name == 'NetflowSource':
+            return _import_source()
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,108 @@
+"""Persisted progress of incremental reads over a set of files.
+
+A checkpoint records, for every file read so far, the offset up to which its
+packets were processed, the size and modification time of the file at that
+point, a digest of its first bytes, and the Version 9 templates seen in it. A
+later read uses this to skip unchanged files, resume appended files at the
+recorded offset with their template cache restored, and start over on files
+that were rotated or truncated. Size and modification time alone cannot tell
+a file replaced by a larger one from an appended one; the digest of the
+first bytes, which hold the header of the first packet, can.
+
+Checkpoints are stored as JSON; templates are kept in their wire format,
+encoded as a single template flowset.
+"""
+
+import hashlib
+import io
+import json
+import os
+
+from .v9 import TemplateFlowSet
+
+
+FORMAT_VERSION = 1
+
+# Number of leading bytes of a file whose digest identifies its contents
+HEAD_SIZE = 1024
+
+
+def encode_templates(templates):
+    """Encode a dict of template records as a hex string."""
+    return TemplateFlowSet(templates.values()).encode().hex() if templates else ''
+
+
+def decode_templates(raw):
+    """Decode template records encoded by ``encode_templates``."""
+    return TemplateFlowSet.decode(io.BytesIO(bytes.fromhex(raw))).templates if raw else {}
+
+
+def digest(raw):
+    """Return the hex digest of the leading bytes of a file."""
+    return hashlib.sha1(raw).hexdigest()
+
+
+class Checkpoint(object):
+    """Progress of incremental reads, stored in a local JSON file.
+
+    Parameters:
+        path : str
+            Location of the checkpoint file. It is created on first save.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get('version') != FORMAT_VERSION:
+                raise ValueError("unsupported checkpoint version: {}".format(state.get('version')))
+            self.files = state['files']
+
+    def start(self, path, size, mtime, compressed=False, head=None):
+        """Plan the read of a file given its current size and modification time.
+
+        Returns None if the file is unchanged since the last save, or a tuple
+        of the offset to start reading at and the templates to start with.
+        Appended files resume where the last read stopped; files that shrank
+        below that point, or whose first bytes changed, have been replaced
+        and are read from the start. Compressed files cannot be resumed and
+        are read from the start when they change.
+
+        Parameters:
+            head : callable, optional
+                Returns the first ``HEAD_SIZE`` bytes of the file; only
+                called for files that changed.
+        """
+        entry = self.files.get(path)
+        if entry is None:
+            return 0, {}
+        if entry['size'] == size and entry['mtime'] == mtime:
+            return None
+        if compressed or size < entry['offset']:
+            return 0, {}
+        if head is not None and entry.get('head'):
+            length, expected = entry['head']
+            raw = head()[:length]
+            if len(raw) < length or digest(raw) != expected:
+                return 0, {}
+        return entry['offset'], decode_templates(entry['templates'])
+
+    def update(self, path, offset, size, mtime, templates=None, head=None):
+        """Record the progress of a file.
+
+        ``head`` holds the first bytes of the file, up to ``HEAD_SIZE``,
+        when it was planned.
+        """
+        self.files[path] = dict(offset=offset, size=size, mtime=mtime,
+                                templates=encode_templates(templates))
+        if head is not None:
+            self.files[path]['head'] = [len(head), digest(head)]
+
+    def save(self):
+        """Write the checkpoint, replacing the previous file atomically."""
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(dict(version=FORMAT_VERSION, files=self.files), f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
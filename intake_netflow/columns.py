@@ -0,0 +1,187 @@
+"""Bulk transformations over decoded columns.
+
+A decoded data flowset (or a whole Version 5 packet) is represented as a dict
+of NumPy arrays keyed by lowercase field name, all of the same length. The
+functions in this module operate on whole columns at once, so the cost of a
+transformation is paid once per flowset rather than once per record.
+"""
+
+import collections
+import ipaddress
+
+import numpy as np
+
+
+IPV4_FIELDS = frozenset([
+    'ipv4_src_addr',
+    'ipv4_dst_addr',
+    'ipv4_next_hop',
+    'bgp_ipv4_next_hop',
+    'ipv4_src_prefix',
+    'ipv4_dst_prefix',
+    'mpls_top_label_ip_addr',
+])
+
+IPV6_FIELDS = frozenset([
+    'ipv6_src_addr',
+    'ipv6_dst_addr',
+    'ipv6_next_hop',
+    'bpg_ipv6_next_hop',
+])
+
+ADDRESS_MODES = (None, 'uint32', 'bytes16', 'uint64', 'str')
+
+
+def to_records(columns):
+    """Convert columns into a list of dicts keyed by column name."""
+    keys = list(columns)
+    values = [columns[key].tolist() for key in keys]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+
+def ipv4_to_ipv6(values):
+    """Map uint32 IPv4 addresses to (n, 16) uint8 IPv4-mapped IPv6 addresses."""
+    octets = np.zeros((len(values), 16), dtype='u1')
+    octets[:, 10:12] = 0xff
+    octets[:, 12:] = values.astype('>u4').view('u1').reshape(-1, 4)
+    return octets
+
+
+def ipv4_to_str(values):
+    """Format uint32 IPv4 addresses as dotted-quad strings."""
+    octets = values.astype('>u4').view('u1').reshape(-1, 4).astype(str)
+    dotted = octets[:, 0]
+    for i in range(1, 4):
+        dotted = np.char.add(np.char.add(dotted, '.'), octets[:, i])
+    return dotted
+
+
+def ipv6_to_str(octets):
+    """Format (n, 16) uint8 IPv6 addresses in compressed notation.
+
+    Each distinct address is formatted once, which keeps the cost proportional
+    to the number of distinct addresses rather than the number of records.
+    """
+    packed = np.ascontiguousarray(octets).view('V16').ravel()
+    unique, inverse = np.unique(packed, return_inverse=True)
+    text = np.array([ipaddress.IPv6Address(bytes(addr)).compressed for addr in unique.tolist()],
+                    dtype='U39')
+    return text[inverse] if len(text) else np.empty(0, dtype='U39')
+
+
+def split_uint64(octets):
+    """Split (n, 16) uint8 addresses into high and low uint64 halves."""
+    halves = np.ascontiguousarray(octets).view('>u8').astype('u8')
+    return halves[:, 0], halves[:, 1]
+
+
+def convert_addresses(columns, mode=None):
+    """Convert IP address columns into the given representation.
+
+    Parameters:
+        columns : dict
+            Decoded columns keyed by lowercase field name.
+        mode : str, optional
+            One of the following address representations:
+
+            - None: IPv4 as integers, IPv6 as 16 integers per address.
+            - ``'uint32'``: IPv4 as uint32, IPv6 as 16-byte fixed values.
+            - ``'bytes16'``: IPv4-mapped IPv6 and IPv6 as 16-byte fixed values.
+            - ``'uint64'``: ``<name>_hi`` and ``<name>_lo`` uint64 columns
+              holding the IPv4-mapped or IPv6 address.
+            - ``'str'``: dotted-quad IPv4 and compressed IPv6 strings.
+    """
+    if mode not in ADDRESS_MODES:
+        raise ValueError("invalid address mode: {}".format(mode))
+    if mode is None:
+        return columns
+
+    converted = collections.OrderedDict()
+    for name, values in columns.items():
+        if name in IPV4_FIELDS:
+            values = values.astype('u4')
+            if mode == 'uint32':
+                converted[name] = values
+            elif mode == 'str':
+                converted[name] = ipv4_to_str(values)
+            elif mode == 'bytes16':
+                converted[name] = ipv4_to_ipv6(values).view('V16').ravel()
+            else:
+                converted[name + '_hi'], converted[name + '_lo'] = split_uint64(ipv4_to_ipv6(values))
+        elif name in IPV6_FIELDS and values.ndim == 2 and values.shape[1] == 16:
+            if mode == 'str':
+                converted[name] = ipv6_to_str(values)
+            elif mode == 'uint64':
+                converted[name + '_hi'], converted[name + '_lo'] = split_uint64(values)
+            else:
+                converted[name] = np.ascontiguousarray(values).view('V16').ravel()
+        else:
+            converted[name] = values
+    return converted
+
+
+def add_timestamps(columns, uptime, datetime, milliseconds=0):
+    """Add absolute start, end and duration columns for flows.
+
+    ``FIRST_SWITCHED`` and ``LAST_SWITCHED`` are milliseconds of exporter
+    uptime. Given the uptime and export time of their packet, they are turned
+    into ``flow_start`` and ``flow_end`` columns of ``datetime64[ms]``, and
+    ``flow_duration`` of ``timedelta64[ms]``. Uptime differences are computed
+    modulo 2**32, so counters that wrapped around are handled.
+
+    Parameters:
+        columns : dict
+            Decoded columns keyed by lowercase field name.
+        uptime : int
+            Exporter uptime in milliseconds at export time.
+        datetime : int
+            Export time in seconds since 0000 UTC 1970.
+        milliseconds : int, optional
+            Residual milliseconds of the export time.
+    """
+    if 'first_switched' not in columns and 'last_switched' not in columns:
+        return columns
+
+    converted = collections.OrderedDict(columns)
+    export = np.int64(datetime) * 1000 + milliseconds
+    for name, key in (('first_switched', 'flow_start'), ('last_switched', 'flow_end')):
+        if name in columns:
+            elapsed = (np.uint32(uptime) - columns[name].astype('u4')).view('i4')
+            converted[key] = (export - elapsed.astype('i8')).astype('datetime64[ms]')
+    if 'first_switched' in columns and 'last_switched' in columns:
+        duration = (columns['last_switched'].astype('u4') - columns['first_switched'].astype('u4')).view('i4')
+        converted['flow_duration'] = duration.astype('timedelta64[ms]')
+    return converted
+
+
+def column_dtypes(columns):
+    """Return the dtypes of columns, including the shape of multi-value items."""
+    dtypes = collections.OrderedDict()
+    for name, values in columns.items():
+        dtypes[name] = np.dtype((values.dtype, values.shape[1:])) if values.ndim > 1 else values.dtype
+    return dtypes
+
+
+def union_dtypes(schemas):
+    """Merge column dtypes of several tables into a single schema.
+
+    Columns are ordered by first appearance. A column with different dtypes in
+    different tables gets the smallest dtype that can hold all of them, or
+    ``object`` if there is none.
+
+    Parameters:
+        schemas : iterable of dict
+            Column dtypes keyed by column name.
+    """
+    union = collections.OrderedDict()
+    for schema in schemas:
+        for name, dtype in schema.items():
+            dtype = np.dtype(dtype)
+            if name not in union or union[name] == dtype:
+                union[name] = dtype
+                continue
+            try:
+                union[name] = np.promote_types(union[name], dtype)
+            except TypeError:
+                union[name] = np.dtype(object)
+    return union
@@ -0,0 +1,248 @@
+"""Streams over captures that mix several NetFlow versions.
+
+Every NetFlow and IPFIX packet starts with a 2-byte version field. The streams
+in this module peek at that field and hand each packet to the decoder of the
+matching version, so a collector dump holding Version 5 and Version 9 packets
+can be read in a single pass. Template records are cached per version.
+
+``scan_schema`` walks a stream in the template scan mode, decoding packet
+headers and template flowsets only, to derive the columns and record count of
+the stream without reading data payloads.
+
+IPFIX (Version 10) packets are not decoded, but because their header carries
+the total message length they are skipped cleanly and counted in
+``PacketStream.skipped``.
+"""
+
+import collections
+import struct
+
+from . import v5, v9
+from .columns import column_dtypes
+from .utils import PacketReader, RecordQueue, export_time, peek, read_and_unpack, skip
+
+
+s_version = struct.Struct("!H")
+s_ipfix_header = struct.Struct("!HHIII")
+
+DECODERS = {
+    5: v5.ExportPacket,
+    9: v9.ExportPacket,
+}
+
+SKIPPABLE = {
+    10: s_ipfix_header,
+}
+
+
+class PacketDecoder(object):
+    """Decoder for packets of any supported version.
+
+    Template records are cached per version, and packets of versions that are
+    skipped rather than decoded are counted in ``skipped``.
+
+    Parameters:
+        scan : str, optional
+            Scan mode of the packets; see ``v9.PacketStream``.
+        sampler : callable, optional
+            Chooses the packets whose data records are decoded; see
+            ``v9.PacketStream``.
+    """
+
+    def __init__(self, scan=None, sampler=None):
+        if scan not in v9.SCAN_MODES:
+            raise ValueError("invalid scan mode: {}".format(scan))
+        self.scan = scan
+        self.sampler = sampler
+        self.caches = {9: {}}
+        self.skipped = collections.Counter()
+
+    def decode(self, source, validate=False):
+        """Decode the next packet from a stream.
+
+        If ``validate`` is True, packets are checked with their ``validate``
+        method before their templates are cached. Packets of versions that
+        are skipped are read past and returned as None, so the caller can
+        account for them before the next packet is looked at.
+        """
+        version = s_version.unpack(peek(source, s_version.size))[0]
+        if version not in DECODERS:
+            if version not in SKIPPABLE:
+                raise ValueError("unsupported NetFlow version: {}".format(version))
+            header = read_and_unpack(source, SKIPPABLE[version])
+            if header[1] < SKIPPABLE[version].size:
+                raise ValueError("invalid packet length: {}".format(header[1]))
+            skip(source, header[1] - SKIPPABLE[version].size)
+            self.skipped[version] += 1
+            return None
+
+        packet = DECODERS[version].decode(source, self.scan, self.sampler)
+        if validate:
+            packet.validate()
+
+        cache = self.caches.get(version)
+        if cache is not None:
+            # Add templates to cache
+            packet.update_cache(cache)
+
+            # Finish deserialization
+            packet.apply(cache)
+
+        return packet
+
+
+class PacketStream(PacketReader):
+    """A read-only representation of serialized packets of mixed versions.
+
+    The offset of the end of the last complete packet read is kept in
+    ``offset``, and counts of packets read and skipped in ``stats``.
+
+    Parameters:
+        source : file-like object
+            Read-only input for packets.
+        scan : str, optional
+            Scan mode of the packets; see ``v9.PacketStream``.
+        sampler : callable, optional
+            Chooses the packets whose data records are decoded; see
+            ``v9.PacketStream``.
+        follow, poll_interval, timeout, errors : optional
+            Options for files that are still being written, and for packets
+            that cannot be decoded; see ``utils.PacketReader``.
+    """
+
+    markers = tuple(s_version.pack(version) for version in sorted(set(DECODERS) | set(SKIPPABLE)))
+
+    def __init__(self, source, scan=None, sampler=None, follow=False, poll_interval=1.0,
+                 timeout=None, errors='stop'):
+        decoder = PacketDecoder(scan, sampler)
+        super(PacketStream, self).__init__(source, follow, poll_interval, timeout, errors)
+        self._decoder = decoder
+
+    @property
+    def skipped(self):
+        """Number of skipped packets, keyed by version."""
+        return self._decoder.skipped
+
+    @property
+    def templates(self):
+        """Version 9 template records seen so far, keyed by template ID."""
+        return self._decoder.caches[9]
+
+    def decode(self, source):
+        return self._decoder.decode(source, validate=self._errors == 'resync')
+
+    def next(self):
+        return self.read_packet()
+
+    def count(self, window=None):
+        """Count the data records of the remaining packets.
+
+        See ``v9.PacketStream.count``; Version 5 records are counted under
+        ``(engine_id, None)``.
+
+        Parameters:
+            window : callable, optional
+                Chooses the packets to count by their header, such as a
+                ``utils.TimeWindow``.
+        """
+        scan, self._decoder.scan = self._decoder.scan, 'templates'
+        try:
+            return sum((packet.count() for packet in self
+                        if window is None or window(packet.header)), collections.Counter())
+        finally:
+            self._decoder.scan = scan
+
+
+def count_records(source, templates=None, window=None, errors='stop'):
+    """Count the data records of a stream by source ID and template ID.
+
+    Parameters:
+        source : file-like object
+            Read-only input for packets.
+        templates : dict, optional
+            Template records known before the start of the stream.
+        window : callable, optional
+            Chooses the packets to count; see ``PacketStream.count``.
+        errors : str, optional
+            Handling of packets that cannot be decoded; see
+            ``utils.PacketReader``.
+    """
+    stream = PacketStream(source, errors=errors)
+    stream.templates.update(templates or {})
+    return stream.count(window)
+
+
+def scan_schema(source, address=None, timestamps=False, templates=None, errors='stop'):
+    """Derive the columns, number of data records and time range of a stream.
+
+    Only packet headers and template flowsets are decoded. The number of
+    records of a data flowset is its payload length divided by the record
+    length of its template; flowsets padded by more than a record are rare,
+    so the total is an estimate. Data flowsets whose template is never seen
+    are not counted, as they are not decoded either.
+
+    Parameters:
+        source : file-like object
+            Read-only input for packets.
+        address : str, optional
+            Representation of IP address fields; see
+            ``columns.convert_addresses``.
+        timestamps : bool, optional
+            If True, include the columns added by ``columns.add_timestamps``.
+        templates : dict, optional
+            Template records known before the start of the stream.
+        errors : str, optional
+            Handling of packets that cannot be decoded; see
+            ``utils.PacketReader``.
+
+    Returns:
+        A tuple of a list of column dtypes keyed by name, one per record
+        layout, the number of records, and the first and last export times
+        of the packets in milliseconds (or None if there are no packets).
+    """
+    empty = collections.OrderedDict()
+    count = 0
+    bounds = None
+    stream = PacketStream(source, scan='templates', errors=errors)
+    stream.templates.update(templates or {})
+    for packet in stream:
+        count += sum(packet.count().values())
+        time = export_time(packet.header)
+        bounds = (min(bounds[0], time), max(bounds[1], time)) if bounds else (time, time)
+        if packet.header.version == 5:
+            empty.setdefault(5, packet)
+            continue
+        for flowset in packet.flowsets:
+            if not isinstance(flowset, v9.SkippedFlowSet) or flowset.template is None:
+                continue
+            if flowset.template.dtype not in empty:
+                templates = {flowset.id: flowset.template}
+                data = v9.DataFlowSet(flowset.id, [], templates)
+                empty[flowset.template.dtype] = v9.ExportPacket([data], header=packet.header)
+
+    schemas = [column_dtypes(columns)
+               for packet in empty.values()
+               for columns in packet.iter_columns(address, timestamps)]
+    return schemas, count, bounds
+
+
+class RecordStream(RecordQueue, PacketStream):
+    """A read-only representation of serialized data records of mixed versions.
+
+    Parameters:
+        source : file-like object
+            Read-only input for data records.
+        address, timestamps, sampler : optional
+            Decoding of the records; see ``utils.RecordQueue``.
+        follow, poll_interval, timeout, errors : optional
+            Options for files that are still being written, and for packets
+            that cannot be decoded; see ``utils.PacketReader``.
+    """
+
+    def __init__(self, source, address=None, timestamps=False, sampler=None, follow=False,
+                 poll_interval=1.0, timeout=None, errors='stop'):
+        super(RecordStream, self).__init__(source, sampler=sampler, follow=follow,
+                                           poll_interval=poll_interval, timeout=timeout,
+                                           errors=errors)
+        self._address = address
+        self._timestamps = timestamps
@@ -0,0 +1,349 @@
+"""Conversion of decoded packets into pandas dataframes.
+
+Records are indexed by ``export_time``, the export time of the packet that
+carried them, so partitions of a dask dataframe can be described by the
+export times of their packets. Columns are collected per record layout and
+concatenated once per partition, rather than converted record by record.
+
+Columns that pandas cannot hold natively are converted: multi-value address
+columns and fixed-size byte values become ``bytes`` objects, and times are
+stored in nanoseconds.
+"""
+
+import collections
+import itertools
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .columns import union_dtypes
+from .utils import export_time
+
+
+INDEX = 'export_time'
+
+
+def frame_dtype(dtype, nullable=False):
+    """Map the dtype of a decoded column to the dtype of a dataframe column.
+
+    Parameters:
+        dtype : numpy.dtype
+            Dtype of the decoded column, including the shape of its items.
+        nullable : bool, optional
+            If True, the column is missing from some records, which pandas
+            fills with NaN.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.subdtype is not None or dtype.kind in 'OSUV':
+        return np.dtype(object)
+    if dtype.kind == 'M':
+        return np.dtype('datetime64[ns]')
+    if dtype.kind == 'm':
+        return np.dtype('timedelta64[ns]')
+    if nullable and dtype.kind in 'biu':
+        return np.dtype('f8')
+    return dtype
+
+
+def frame_column(values):
+    """Convert a decoded column into values a dataframe column can hold."""
+    if values.ndim > 1:
+        values = np.ascontiguousarray(values).view('V{}'.format(values[0].nbytes)).ravel()
+    if values.dtype.kind == 'V':
+        column = np.empty(len(values), dtype=object)
+        column[:] = values.tolist()
+        return column
+    return values.astype(frame_dtype(values.dtype), copy=False)
+
+
+def categorical_column(values):
+    """Dictionary-encode a decoded column.
+
+    Only the distinct values are converted by ``frame_column``, so byte
+    values do not become an object column first.
+    """
+    if values.ndim > 1:
+        values = np.ascontiguousarray(values).view('V{}'.format(values[0].nbytes)).ravel()
+    categories, codes = np.unique(values, return_inverse=True)
+    return pd.Categorical.from_codes(codes, frame_column(categories))
+
+
+def meta_frame(dtypes, nullable=(), categorical=()):
+    """Create an empty dataframe with the columns of decoded records.
+
+    Parameters:
+        dtypes : dict
+            Column dtypes keyed by name, as derived by ``dispatch.scan_schema``.
+        nullable : iterable of str, optional
+            Names of columns that are missing from some records.
+        categorical : iterable of str, optional
+            Names of columns to store as categoricals. Frames collected
+            with the result as ``meta`` dictionary-encode these columns as
+            they are built; see ``layout_frames``.
+    """
+    nullable = frozenset(nullable)
+    categorical = frozenset(categorical)
+    columns = collections.OrderedDict()
+    for name, dtype in dtypes.items():
+        if name in categorical:
+            columns[name] = pd.Series([], dtype='category')
+        else:
+            columns[name] = np.empty(0, dtype=frame_dtype(dtype, name in nullable))
+    return pd.DataFrame(columns, index=pd.DatetimeIndex([], name=INDEX))
+
+
+def packets_to_frame(packets, address=None, timestamps=False, meta=None):
+    """Collect the data records of packets into a dataframe.
+
+    Parameters:
+        packets : iterable
+            Decoded Version 5 and/or Version 9 packets.
+        address : str, optional
+            Representation of IP address fields; see
+            ``columns.convert_addresses``.
+        timestamps : bool, optional
+            If True, add absolute flow times; see ``columns.add_timestamps``.
+        meta : pandas.DataFrame, optional
+            Empty dataframe whose columns and dtypes the result is cast to.
+
+    Returns:
+        A dataframe indexed and sorted by ``export_time``.
+    """
+    frames = list(layout_frames(packets, address, timestamps, categorical_names(meta)).values())
+    if frames:
+        frame = concat_frames(frames).reset_index(drop=True)
+    else:
+        frame = pd.DataFrame({INDEX: np.empty(0, dtype='datetime64[ns]')})
+    frame = frame.sort_values(INDEX, kind='mergesort').set_index(INDEX)
+    return cast_frame(frame, meta)
+
+
+def layout_frames(packets, address=None, timestamps=False, categorical=()):
+    """Collect the data records of packets into a dataframe per record layout.
+
+    Parameters:
+        categorical : iterable of str, optional
+            Names of columns to dictionary-encode; see ``categorical_column``.
+
+    Returns:
+        A dict of unsorted dataframes with an ``export_time`` column, keyed
+        by the tuple of column names of each layout.
+    """
+    categorical = frozenset(categorical)
+    layouts = collections.OrderedDict()
+    for packet in packets:
+        for columns in packet.iter_columns(address, timestamps):
+            nrecords = len(next(iter(columns.values()), ()))
+            if not nrecords:
+                continue
+            layout = layouts.setdefault(tuple(columns), collections.defaultdict(list))
+            for name, values in columns.items():
+                layout[name].append(values)
+            times = np.full(nrecords, export_time(packet.header) * 1000000, dtype='i8')
+            layout[INDEX].append(times.view('datetime64[ns]'))
+
+    return collections.OrderedDict(
+        (signature, pd.DataFrame(collections.OrderedDict(
+            (name, (categorical_column if name in categorical else frame_column)(
+                np.concatenate(arrays)))
+            for name, arrays in layout.items())))
+        for signature, layout in layouts.items())
+
+
+def cast_frame(frame, meta=None):
+    """Cast a dataframe to the columns and dtypes of an empty one, if given.
+
+    Categorical columns of ``meta`` that the frame does not hold as such,
+    such as columns missing from it, are dictionary-encoded with the
+    categories found in the frame.
+    """
+    if meta is not None:
+        frame = frame.reindex(columns=meta.columns)
+        for name, dtype in meta.dtypes.items():
+            if is_categorical(dtype):
+                if not is_categorical(frame[name].dtype):
+                    frame[name] = frame[name].astype('category')
+            elif frame[name].dtype != dtype:
+                frame[name] = frame[name].astype(dtype)
+    return frame
+
+
+def is_categorical(dtype):
+    """Whether a dataframe column dtype is categorical."""
+    return isinstance(dtype, pd.CategoricalDtype)
+
+
+def categorical_names(meta):
+    """Names of the categorical columns of an empty dataframe, if given."""
+    if meta is None:
+        return ()
+    return [name for name, dtype in meta.dtypes.items() if is_categorical(dtype)]
+
+
+def concat_frames(frames):
+    """Concatenate dataframes, keeping categorical columns categorical.
+
+    pandas turns categorical columns with different categories into objects
+    when concatenating them, so their categories are merged first; only the
+    codes of each frame are rewritten.
+    """
+    frames = list(frames)
+    names = set(name for frame in frames for name, dtype in frame.dtypes.items()
+                if is_categorical(dtype))
+    for name in names:
+        columns = [frame[name] for frame in frames if name in frame]
+        if not all(is_categorical(column.dtype) for column in columns):
+            continue
+        categories = union_categoricals(columns, ignore_order=True).categories
+        frames = [frame.assign(**{name: frame[name].cat.set_categories(categories)})
+                  if name in frame else frame
+                  for frame in frames]
+    return pd.concat(frames)
+
+
+def packets_to_tables(packets, address=None, timestamps=False, metas=None):
+    """Collect the data records of packets into a dense dataframe per layout.
+
+    Records of templates with the same column names share a table, whatever
+    their template IDs and exporters. Unlike ``packets_to_frame``, no column
+    is missing from any record of a table, so integer columns keep their
+    dtypes.
+
+    Parameters:
+        packets : iterable
+            Decoded Version 5 and/or Version 9 packets.
+        address, timestamps : optional
+            See ``packets_to_frame``.
+        metas : dict, optional
+            Empty dataframes keyed by layout, as created by ``meta_frame``;
+            tables are cast to them, and layouts without records are
+            included as empty tables.
+
+    Returns:
+        A dict of dataframes indexed and sorted by ``export_time``, keyed by
+        the tuple of column names of each layout.
+    """
+    metas = metas or {}
+    tables = collections.OrderedDict(metas)
+    categorical = set(name for meta in metas.values() for name in categorical_names(meta))
+    for signature, frame in layout_frames(packets, address, timestamps, categorical).items():
+        frame = frame.sort_values(INDEX, kind='mergesort').set_index(INDEX)
+        tables[signature] = cast_frame(frame, metas.get(signature))
+    return tables
+
+
+def nullable_dtype(dtype):
+    """Map a dataframe column dtype to a pandas dtype with explicit nulls."""
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'iu':
+        return pd.api.types.pandas_dtype('{}Int{}'.format('U' if dtype.kind == 'u' else '',
+                                                          dtype.itemsize * 8))
+    if dtype.kind == 'b':
+        return pd.BooleanDtype()
+    return dtype
+
+
+def merge_tables(tables):
+    """Merge per-layout tables into a single dataframe with explicit nulls.
+
+    Integer and boolean columns that are missing from some tables become
+    pandas nullable columns, so their missing values are ``<NA>`` rather
+    than NaN with the column converted to floats. Missing values of other
+    columns are NaN, NaT or None.
+
+    Parameters:
+        tables : dict
+            Dataframes indexed by ``export_time``, as returned by
+            ``packets_to_tables``.
+
+    Returns:
+        A dataframe sorted by ``export_time``.
+    """
+    frames = list(tables.values())
+    categorical = set(name for frame in frames for name, dtype in frame.dtypes.items()
+                      if is_categorical(dtype))
+    dtypes = union_dtypes(
+        collections.OrderedDict((name, dtype) for name, dtype in frame.dtypes.items()
+                                if name not in categorical)
+        for frame in frames)
+    for name, dtype in dtypes.items():
+        if any(name not in frame for frame in frames):
+            dtypes[name] = nullable_dtype(dtype)
+
+    names = list(collections.OrderedDict.fromkeys(name for frame in frames for name in frame))
+    merged = []
+    for frame in frames:
+        columns = collections.OrderedDict()
+        for name in names:
+            if name in categorical:
+                columns[name] = frame[name] if name in frame else pd.Series(
+                    None, index=frame.index, dtype='category')
+            elif name in frame:
+                columns[name] = frame[name].astype(dtypes[name])
+            else:
+                columns[name] = pd.Series(None, index=frame.index, dtype=dtypes[name])
+        merged.append(pd.DataFrame(columns, index=frame.index))
+    if not merged:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name=INDEX))
+    return concat_frames(merged).sort_index(kind='mergesort')
+
+
+def iter_frames(packets, chunksize=None, address=None, timestamps=False, meta=None):
+    """Collect the data records of packets into dataframes of a fixed size.
+
+    Packets are converted a chunk at a time, so only about ``chunksize``
+    records are held at once. Each frame is sorted by ``export_time``; frames
+    follow the order of the packets.
+
+    Parameters:
+        packets : iterable
+            Decoded Version 5 and/or Version 9 packets.
+        chunksize : int, optional
+            Number of records per frame; the last frame may be shorter. If
+            None, a single frame of all records is yielded.
+        address, timestamps, meta : optional
+            See ``packets_to_frame``.
+    """
+    if chunksize is None:
+        yield packets_to_frame(packets, address, timestamps, meta)
+        return
+
+    pending, count, rest = [], 0, None
+    for packet in itertools.chain(packets, [None]):
+        if packet is not None:
+            pending.append(packet)
+            count += sum(packet.count().values())
+            if count < chunksize:
+                continue
+        frame = packets_to_frame(pending, address, timestamps, meta)
+        if rest is not None:
+            frame = concat_frames([rest, frame])
+        pending = []
+        while len(frame) >= chunksize:
+            yield frame.iloc[:chunksize]
+            frame = frame.iloc[chunksize:]
+        rest, count = frame, len(frame)
+    if len(rest):
+        yield rest
+
+
+def divisions(bounds):
+    """Derive dataframe divisions from the export time bounds of partitions.
+
+    Parameters:
+        bounds : list
+            ``(first, last)`` export times in milliseconds of each partition,
+            in partition order, or None where unknown.
+
+    Returns:
+        A list of timestamps, or None if the partitions are not known to be
+        ordered by export time without overlap.
+    """
+    if not bounds or any(bound is None for bound in bounds):
+        return None
+    for (_, last), (first, _) in zip(bounds[:-1], bounds[1:]):
+        if last >= first:
+            return None
+    times = [first for first, _ in bounds] + [bounds[-1][1]]
+    return [pd.Timestamp(time, unit='ms') for time in times]
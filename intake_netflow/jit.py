@@ -0,0 +1,76 @@
+"""Optional Numba kernels for decoding data records.
+
+Integer-typed template fields of odd widths, such as a 3-byte
+``MPLS_TOP_LABEL_TYPE`` or an unknown vendor field of up to 8 bytes, have no
+NumPy dtype: they are viewed as raw bytes and folded into uint64 values.
+Bytes-typed fields, such as ``MPLS_LABEL_1`` and the MAC addresses, keep
+their raw bytes.
+``fold_fields`` folds all such fields of a flowset at once into a single
+preallocated array. With Numba installed this is one compiled pass over the
+payload; the kernel is cached on disk, so it is compiled once per
+installation rather than once per process. Without Numba the same values are
+computed with NumPy, one field at a time.
+
+Numba is imported on first use, keeping the codec modules quick to import.
+"""
+
+import numpy as np
+
+
+_kernel = None
+
+
+def _fold(buf, count, record_length, offsets, widths, out):
+    for i in range(count):
+        base = i * record_length
+        for j in range(offsets.shape[0]):
+            pos = base + offsets[j]
+            value = np.uint64(0)
+            for k in range(widths[j]):
+                value = (value << np.uint64(8)) | np.uint64(buf[pos + k])
+            out[j, i] = value
+
+
+def kernel():
+    """Return the compiled folding kernel, or None if Numba is not installed."""
+    global _kernel
+    if _kernel is None:
+        try:
+            import numba
+        except ImportError:
+            _kernel = False
+        else:
+            _kernel = numba.njit(cache=True, nogil=True)(_fold)
+    return _kernel or None
+
+
+def fold_fields(array, names):
+    """Fold odd-width integer fields of records into uint64 values.
+
+    Parameters:
+        array : numpy.ndarray
+            Structured array of records whose fields ``names`` are big-endian
+            integers stored as ``(width,)`` uint8 subarrays.
+        names : list of str
+            Names of the fields to fold.
+
+    Returns:
+        A uint64 array of shape ``(len(names), len(array))``.
+    """
+    out = np.empty((len(names), len(array)), dtype='u8')
+    if not len(array):
+        return out
+    fold = kernel()
+    if fold is not None:
+        buf = np.ascontiguousarray(array).view('u1')
+        offsets = np.array([array.dtype.fields[name][1] for name in names], dtype=np.intp)
+        widths = np.array([array.dtype[name].itemsize for name in names], dtype=np.intp)
+        fold(buf, len(array), array.dtype.itemsize, offsets, widths, out)
+        return out
+    for j, name in enumerate(names):
+        octets = array[name]
+        out[j] = 0
+        for k in range(octets.shape[1]):
+            out[j] <<= np.uint64(8)
+            out[j] |= octets[:, k]
+    return out
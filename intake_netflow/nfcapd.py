@@ -0,0 +1,295 @@
+"""Reader for nfcapd files written by nfdump.
+
+An nfcapd file (layout version 1, as written by nfdump 1.6) consists of a
+file header, a statistics record and a sequence of data blocks::
+
+    +-------------+-------------+--------------+--------------+-----+
+    | File Header | Stat Record | Block Header | Block Data   | ... |
+    +-------------+-------------+--------------+--------------+-----+
+
+Block data is optionally compressed with LZO, bzip2, LZ4 or zstd, as flagged
+in the file header. It holds variable-length records; flow records carry
+absolute first/last times, ports, protocol, addresses and counters, followed
+by optional extensions, which are skipped. Records are decoded into the same
+columns as NetFlow data records, grouped by address family and counter width,
+with ``flow_start`` and ``flow_end`` as ``datetime64[ms]``.
+
+Files are written in the byte order of the host running nfdump; both orders
+are detected from the magic number.
+
+The format is described in nfdump's ``nffile.h`` and ``nfx.h``.
+"""
+
+import bz2
+import collections
+import struct
+
+import attr
+import numpy as np
+
+from .columns import convert_addresses, to_records
+from .utils import RecordQueue
+
+
+MAGIC = 0xa50c
+LAYOUT_VERSION_1 = 1
+IDENT_LENGTH = 128
+STAT_RECORD_SIZE = 136
+
+# Maximum size of an uncompressed data block, as in nfdump's BUFFSIZE.
+BLOCK_SIZE = 5 * 2**20
+
+FLAG_LZO_COMPRESSED = 0x1
+FLAG_BZ2_COMPRESSED = 0x8
+FLAG_LZ4_COMPRESSED = 0x10
+FLAG_ZSTD_COMPRESSED = 0x20
+
+BLOCK_UNCOMPRESSED = 0x1
+DATA_BLOCK_TYPE_2 = 2
+
+COMMON_RECORD_TYPE = 10
+COMMON_RECORD_SIZE = 32
+
+FLAG_IPV6_ADDR = 0x1
+FLAG_PKG_64 = 0x2
+FLAG_BYTES_64 = 0x4
+
+# (column name, byte offset, dtype code) of the fixed part of a flow record.
+COMMON_FIELDS = [
+    ('forwarding_status', 20, 'u1'),
+    ('tcp_flags', 21, 'u1'),
+    ('protocol', 22, 'u1'),
+    ('src_tos', 23, 'u1'),
+    ('l4_src_port', 24, 'u2'),
+    ('l4_dst_port', 26, 'u2'),
+]
+
+
+@attr.s(slots=True, frozen=True)
+class FileHeader(object):
+    """File metadata.
+
+    Parameters:
+        byteorder : str
+            Struct byte order of the file, ``'<'`` or ``'>'``.
+        version : int
+            Layout version of the file.
+        flags : int
+            Compression and anonymization flags.
+        blocks : int
+            Number of data blocks in the file.
+        ident : bytes
+            Identifier string of the file.
+    """
+
+    byteorder = attr.ib(type=str)
+    version = attr.ib(type=int)
+    flags = attr.ib(type=int)
+    blocks = attr.ib(type=int)
+    ident = attr.ib(type=bytes)
+
+    @property
+    def data_offset(self):
+        """Offset of the first data block."""
+        return 12 + IDENT_LENGTH + STAT_RECORD_SIZE
+
+    @staticmethod
+    def decode(source):
+        raw = source.read(12 + IDENT_LENGTH)
+        if len(raw) < 12 + IDENT_LENGTH:
+            raise ValueError("not an nfcapd file")
+        for byteorder in '<>':
+            magic, version, flags, blocks = struct.unpack_from(byteorder + "HHII", raw)
+            if magic == MAGIC:
+                break
+        else:
+            raise ValueError("not an nfcapd file")
+        if version != LAYOUT_VERSION_1:
+            raise ValueError("unsupported nfcapd layout version: {}".format(version))
+        return FileHeader(byteorder, version, flags, blocks, raw[12:].rstrip(b'\x00'))
+
+
+def decompress(payload, flags):
+    """Decompress the payload of a data block given the file flags."""
+    if flags & FLAG_LZO_COMPRESSED:
+        try:
+            import lzo
+        except ImportError:
+            raise ImportError("reading LZO-compressed nfcapd files requires python-lzo")
+        return lzo.decompress(payload, False, BLOCK_SIZE)
+    if flags & FLAG_BZ2_COMPRESSED:
+        return bz2.decompress(payload)
+    if flags & FLAG_LZ4_COMPRESSED:
+        try:
+            import lz4.block
+        except ImportError:
+            raise ImportError("reading LZ4-compressed nfcapd files requires lz4")
+        return lz4.block.decompress(payload, uncompressed_size=BLOCK_SIZE)
+    if flags & FLAG_ZSTD_COMPRESSED:
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("reading zstd-compressed nfcapd files requires zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload, max_output_size=BLOCK_SIZE)
+    return payload
+
+
+def iter_blocks(source, header):
+    """Iterate over (offset, record count, size, id, flags) of data blocks.
+
+    Block payloads are skipped, so this walks the block headers of a file
+    without reading its records.
+    """
+    s_block = struct.Struct(header.byteorder + "IIHH")
+    offset = header.data_offset
+    source.seek(offset)
+    for _ in range(header.blocks):
+        raw = source.read(s_block.size)
+        if len(raw) < s_block.size:
+            break
+        nrecords, size, id, flags = s_block.unpack(raw)
+        yield (offset, nrecords, size, id, flags)
+        offset += s_block.size + size
+        source.seek(offset)
+
+
+def block_offsets(stream):
+    """Return the offsets of all data blocks in an nfcapd file."""
+    with stream as f:
+        return [block[0] for block in iter_blocks(f, FileHeader.decode(f))]
+
+
+def gather(buf, offsets, pos, dtype):
+    """Gather a fixed-size field at ``pos`` from records starting at ``offsets``."""
+    dtype = np.dtype(dtype)
+    index = offsets[:, None] + (pos + np.arange(dtype.itemsize))
+    return np.ascontiguousarray(buf[index]).view(dtype)
+
+
+def decode_block(payload, byteorder, nrecords):
+    """Decode the flow records of a block into columns.
+
+    Records are grouped by address family and counter width, and one dict of
+    columns is returned per group.
+    """
+    s_record = struct.Struct(byteorder + "HHH")
+    layouts = collections.defaultdict(list)
+    offset = 0
+    for _ in range(nrecords):
+        if offset + s_record.size > len(payload):
+            break
+        type, size, flags = s_record.unpack_from(payload, offset)
+        if size == 0:
+            break
+        if type == COMMON_RECORD_TYPE:
+            layouts[flags & (FLAG_IPV6_ADDR | FLAG_PKG_64 | FLAG_BYTES_64)].append(offset)
+        offset += size
+
+    buf = np.frombuffer(payload, dtype='u1')
+    blocks = []
+    for flags, offsets in sorted(layouts.items()):
+        offsets = np.array(offsets, dtype=np.intp)
+        columns = collections.OrderedDict()
+
+        for name, pos, msec_pos in (('flow_start', 12, 8), ('flow_end', 16, 10)):
+            seconds = gather(buf, offsets, pos, byteorder + 'u4')[:, 0].astype('i8')
+            msec = gather(buf, offsets, msec_pos, byteorder + 'u2')[:, 0].astype('i8')
+            columns[name] = (seconds * 1000 + msec).astype('datetime64[ms]')
+        for name, pos, code in COMMON_FIELDS:
+            columns[name] = gather(buf, offsets, pos, byteorder + code)[:, 0].astype(code)
+
+        pos = COMMON_RECORD_SIZE
+        if flags & FLAG_IPV6_ADDR:
+            # Addresses are stored as two uint64 halves in host byte order.
+            for name in ('ipv6_src_addr', 'ipv6_dst_addr'):
+                halves = np.hstack([gather(buf, offsets, pos, byteorder + 'u8'),
+                                    gather(buf, offsets, pos + 8, byteorder + 'u8')])
+                columns[name] = halves.astype('>u8').view('u1').reshape(-1, 16)
+                pos += 16
+        else:
+            for name in ('ipv4_src_addr', 'ipv4_dst_addr'):
+                columns[name] = gather(buf, offsets, pos, byteorder + 'u4')[:, 0].astype('u4')
+                pos += 4
+        for name, flag in (('in_pkts', FLAG_PKG_64), ('in_bytes', FLAG_BYTES_64)):
+            code = 'u8' if flags & flag else 'u4'
+            columns[name] = gather(buf, offsets, pos, byteorder + code)[:, 0].astype(code)
+            pos += np.dtype(code).itemsize
+
+        blocks.append(columns)
+    return blocks
+
+
+class BlockStream(object):
+    """A read-only representation of the decoded data blocks of an nfcapd file.
+
+    Each item is a list of column dicts, one per record layout in the block.
+
+    Parameters:
+        source : file-like object
+            Seekable read-only input for an nfcapd file.
+        offset : int, optional
+            Offset of a single data block to decode. If None, all blocks are
+            decoded.
+    """
+
+    def __init__(self, source, offset=None):
+        self._source = source
+        self._offset = offset
+        self._blocks = None
+        self.header = None
+
+    def next(self):
+        if self._blocks is None:
+            self.header = FileHeader.decode(self._source)
+            self._blocks = iter_blocks(self._source, self.header)
+        for offset, nrecords, size, id, flags in self._blocks:
+            if self._offset is not None and offset != self._offset:
+                continue
+            if id != DATA_BLOCK_TYPE_2:
+                continue
+            self._source.seek(offset + 12)
+            payload = self._source.read(size)
+            if not flags & BLOCK_UNCOMPRESSED:
+                payload = decompress(payload, self.header.flags)
+            return decode_block(payload, self.header.byteorder, nrecords)
+        raise StopIteration
+
+    def __next__(self):
+        return self.next()
+
+    def __iter__(self):
+        return self
+
+    def close(self):
+        self._blocks = None
+        return self._source.close()
+
+
+class RecordStream(RecordQueue, BlockStream):
+    """A read-only representation of the flow records of an nfcapd file.
+
+    Parameters:
+        source : file-like object
+            Seekable read-only input for an nfcapd file.
+        offset : int, optional
+            Offset of a single data block to read.
+        address : str, optional
+            Representation of IP address fields; see
+            ``columns.convert_addresses``.
+        timestamps : bool, optional
+            If True, add a ``flow_duration`` field. Absolute ``flow_start``
+            and ``flow_end`` fields are always present.
+    """
+
+    def __init__(self, source, offset=None, address=None, timestamps=False):
+        super(RecordStream, self).__init__(source, offset)
+        self._address = address
+        self._timestamps = timestamps
+
+    def records(self, block):
+        records = []
+        for columns in block:
+            if self._timestamps:
+                columns['flow_duration'] = columns['flow_end'] - columns['flow_start']
+            records.extend(to_records(convert_addresses(columns, self._address)))
+        return records
@@ -0,0 +1,293 @@
+"""Extraction of NetFlow packets from tcpdump pcap and pcapng captures.
+
+Captures of a collector port hold one NetFlow packet per UDP datagram. The
+capture is read a record at a time and each frame is scanned with
+``struct.unpack_from``, so memory use is bounded by the largest frame rather
+than the size of the capture, and frames cut short are skipped. Each payload is
+decoded with the template cache of the exporter that sent it, because
+template IDs are only unique per exporter.
+
+Supported link types are Ethernet (with VLAN tags), raw IP, BSD loopback and
+Linux cooked captures (SLL and SLL2). Fragmented datagrams are skipped.
+"""
+
+import collections
+import functools
+import io
+import struct
+
+from .dispatch import PacketDecoder
+from .utils import RecordQueue, peek, read_exactly
+
+
+PCAP_MAGIC = (0xa1b2c3d4, 0xa1b23c4d)
+PCAPNG_SECTION = 0x0a0d0d0a
+PCAPNG_BYTE_ORDER = 0x1a2b3c4d
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+ETHERTYPE_VLAN = (0x8100, 0x88a8, 0x9100)
+
+IPPROTO_UDP = 17
+
+# Larger records or blocks are taken as corruption
+MAX_BLOCK_SIZE = 2**24
+
+s_ethertype = struct.Struct("!H")
+s_udp = struct.Struct("!HHHH")
+
+
+def network_offset(data, offset, end, linktype):
+    """Return the offset of the IP header of a frame, or -1 if it has none."""
+    if linktype == LINKTYPE_ETHERNET:
+        if offset + 14 > end:
+            return -1
+        ethertype = s_ethertype.unpack_from(data, offset + 12)[0]
+        offset += 14
+        while ethertype in ETHERTYPE_VLAN:
+            if offset + 4 > end:
+                return -1
+            ethertype = s_ethertype.unpack_from(data, offset + 2)[0]
+            offset += 4
+        return offset if ethertype in (ETHERTYPE_IPV4, ETHERTYPE_IPV6) else -1
+    if linktype == LINKTYPE_RAW:
+        return offset
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        return offset + 4
+    if linktype == LINKTYPE_LINUX_SLL:
+        return offset + 16
+    if linktype == LINKTYPE_LINUX_SLL2:
+        return offset + 20
+    return -1
+
+
+def udp_payload(data, offset, end, linktype, ports):
+    """Locate the UDP payload of a captured frame.
+
+    Returns a tuple of (exporter address, payload start, payload end), or None
+    if the frame is not an unfragmented UDP datagram to one of ``ports``, or
+    is cut short by the capture.
+    """
+    offset = network_offset(data, offset, end, linktype)
+    if offset < 0 or offset >= end:
+        return None
+
+    version = data[offset] >> 4
+    if version == 4:
+        if offset + 20 > end:
+            return None
+        if data[offset + 9] != IPPROTO_UDP or (s_ethertype.unpack_from(data, offset + 6)[0] & 0x3fff):
+            return None
+        exporter = data[offset + 12:offset + 16]
+        offset += (data[offset] & 0x0f) * 4
+    elif version == 6:
+        if offset + 40 > end:
+            return None
+        if data[offset + 6] != IPPROTO_UDP:
+            return None
+        exporter = data[offset + 8:offset + 24]
+        offset += 40
+    else:
+        return None
+
+    if offset + s_udp.size > end:
+        return None
+    _, dst_port, length, _ = s_udp.unpack_from(data, offset)
+    if ports is not None and dst_port not in ports:
+        return None
+    return bytes(exporter), offset + s_udp.size, min(offset + length, end)
+
+
+def read_block(source, size):
+    """Read a record or block of a capture, or return None at its end.
+
+    Sizes beyond ``MAX_BLOCK_SIZE`` end the capture too, rather than being
+    read into memory.
+    """
+    if size > MAX_BLOCK_SIZE:
+        return None
+    try:
+        return read_exactly(source, size)
+    except EOFError:
+        return None
+
+
+def iter_pcap(source, ports=None):
+    """Iterate over (exporter, payload) of UDP datagrams in a pcap capture.
+
+    Parameters:
+        source : file-like object
+            Input positioned at the file header of the capture.
+        ports : frozenset of int, optional
+            Destination ports of the datagrams to extract.
+    """
+    header = read_block(source, 24)
+    if header is None:
+        return
+    magic = struct.unpack_from("<I", header)[0]
+    order = '<' if magic in PCAP_MAGIC else '>'
+    linktype = struct.unpack_from(order + "I", header, 20)[0] & 0x0fffffff
+    s_record = struct.Struct(order + "IIII")
+
+    while True:
+        record = read_block(source, s_record.size)
+        if record is None:
+            return
+        _, _, caplen, _ = s_record.unpack(record)
+        frame = read_block(source, caplen)
+        if frame is None:
+            return
+        found = udp_payload(frame, 0, caplen, linktype, ports)
+        if found:
+            yield found[0], frame[found[1]:found[2]]
+
+
+def iter_pcapng(source, ports=None):
+    """Iterate over (exporter, payload) of UDP datagrams in a pcapng capture.
+
+    Parameters:
+        source : file-like object
+            Input positioned at the first block of the capture.
+        ports : frozenset of int, optional
+            Destination ports of the datagrams to extract.
+    """
+    order = '<'
+    linktypes = []
+    while True:
+        head = read_block(source, 12)
+        if head is None:
+            return
+        block_type = struct.unpack_from(order + "I", head)[0]
+        if block_type == PCAPNG_SECTION:
+            magic = struct.unpack_from("<I", head, 8)[0]
+            order = '<' if magic == PCAPNG_BYTE_ORDER else '>'
+            linktypes = []
+        length = struct.unpack_from(order + "I", head, 4)[0]
+        if length < 12:
+            return
+        rest = read_block(source, length - 12)
+        if rest is None:
+            return
+        block = head + rest
+        # The body ends before the trailing copy of the block length
+        end = length - 4
+
+        found = None
+        if block_type == 1 and end >= 10:
+            linktypes.append(struct.unpack_from(order + "H", block, 8)[0])
+        elif block_type == 6 and end >= 28:
+            interface, _, _, caplen = struct.unpack_from(order + "IIII", block, 8)
+            if interface < len(linktypes):
+                found = udp_payload(block, 28, min(28 + caplen, end), linktypes[interface], ports)
+        elif block_type == 3 and linktypes and end >= 12:
+            caplen = struct.unpack_from(order + "I", block, 8)[0]
+            found = udp_payload(block, 12, min(12 + caplen, end), linktypes[0], ports)
+        if found:
+            yield found[0], block[found[1]:found[2]]
+
+
+def iter_payloads(source, ports=None):
+    """Iterate over (exporter, payload) of UDP datagrams in a capture.
+
+    The capture is read a record at a time, so only the frame being scanned
+    is held in memory.
+
+    Parameters:
+        source : file-like object or bytes
+            Input for, or contents of, a pcap or pcapng capture.
+        ports : iterable of int, optional
+            Destination ports of the datagrams to extract. If None, every UDP
+            datagram is extracted.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if ports is not None:
+        ports = frozenset(ports)
+    header = peek(source, 24, exact=False)
+    magic = struct.unpack_from("<I", header)[0] if len(header) == 24 else None
+    if magic == PCAPNG_SECTION:
+        return iter_pcapng(source, ports)
+    if magic in PCAP_MAGIC or (magic is not None and struct.unpack_from(">I", header)[0] in PCAP_MAGIC):
+        return iter_pcap(source, ports)
+    raise ValueError("not a pcap or pcapng capture")
+
+
+class PacketStream(object):
+    """A read-only representation of NetFlow packets in a packet capture.
+
+    Datagrams that cannot be decoded are skipped and counted in
+    ``skipped['invalid']``.
+
+    Parameters:
+        source : file-like object
+            Read-only input for a pcap or pcapng capture.
+        ports : iterable of int, optional
+            Destination ports of the datagrams holding NetFlow packets. If
+            None, every UDP datagram is decoded.
+        sampler : callable, optional
+            Chooses the packets whose data records are decoded; see
+            ``v9.PacketStream``. It is shared by all exporters.
+    """
+
+    def __init__(self, source, ports=None, sampler=None):
+        self._source = source
+        self._ports = ports
+        self._payloads = None
+        self._decoders = collections.defaultdict(functools.partial(PacketDecoder, sampler=sampler))
+        self._invalid = 0
+
+    @property
+    def skipped(self):
+        """Number of skipped packets, keyed by version or ``'invalid'``."""
+        skipped = collections.Counter(invalid=self._invalid)
+        for decoder in self._decoders.values():
+            skipped.update(decoder.skipped)
+        return skipped
+
+    def next(self):
+        if self._payloads is None:
+            self._payloads = iter_payloads(self._source, self._ports)
+        for exporter, payload in self._payloads:
+            try:
+                packet = self._decoders[exporter].decode(io.BytesIO(payload))
+            except Exception:
+                self._invalid += 1
+                continue
+            if packet is not None:
+                return packet
+        raise StopIteration
+
+    def __next__(self):
+        return self.next()
+
+    def __iter__(self):
+        return self
+
+    def close(self):
+        self._payloads = None
+        return self._source.close()
+
+
+class RecordStream(RecordQueue, PacketStream):
+    """A read-only representation of NetFlow data records in a packet capture.
+
+    Parameters:
+        source : file-like object
+            Read-only input for a pcap or pcapng capture.
+        ports : iterable of int, optional
+            Destination ports of the datagrams holding NetFlow packets.
+        address, timestamps, sampler : optional
+            Decoding of the records; see ``utils.RecordQueue``.
+    """
+
+    def __init__(self, source, ports=None, address=None, timestamps=False, sampler=None):
+        super(RecordStream, self).__init__(source, ports, sampler)
+        self._address = address
+        self._timestamps = timestamps
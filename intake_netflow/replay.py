@@ -0,0 +1,167 @@
+"""Replay of captured NetFlow packets to a collector over UDP.
+
+A capture is read into memory and walked with a mixed-version
+``dispatch.PacketStream`` in the header scan mode, which finds the bytes and
+export time of each packet without decoding records. The packets are then
+sent as UDP datagrams to a collector, one per packet, either at their
+original pace, at a fixed number of packets per second, or as fast as
+possible. Packets are sent in batches between checks of the clock, so the
+sender keeps up with high rates.
+
+Version 9 export times have a resolution of one second, so the packets of
+an exporter are paced within each second by the differences of their
+system uptimes in milliseconds. IPFIX packets are skipped by the stream and
+not replayed.
+
+Usage::
+
+    python -m intake_netflow.replay capture.netflow 127.0.0.1:2055 [--rate PPS]
+"""
+
+import argparse
+import io
+import socket
+import time
+
+from . import v5, v9
+from .dispatch import PacketStream
+from .utils import export_time
+
+
+MODES = ('original', 'rate', 'max')
+
+
+def packet_size(packet):
+    """Encoded size of a packet decoded in the header scan mode."""
+    if packet.header.version == 5:
+        return v5.s_header.size + packet.header.count * v5.RECORD_LENGTH
+    return v9.s_header.size + sum(flowset.length for flowset in packet.flowsets)
+
+
+def load_packets(source, errors='stop'):
+    """Read the packets of a stream into memory.
+
+    Parameters:
+        source : file-like object
+            Read-only input for packets of any supported version.
+        errors : str, optional
+            Handling of packets that cannot be decoded; see
+            ``utils.PacketReader``.
+
+    Returns:
+        A list of ``(export time in milliseconds, raw bytes)`` tuples, the
+        bytes being views of a single buffer. The export times of version 9
+        packets are advanced by the uptime elapsed since the previous packet
+        of their source ID, as long as they stay within the second of the
+        header; when the uptime goes backwards, such as after a restart of
+        the exporter, the export time of the header is kept.
+    """
+    raw = source.read()
+    view = memoryview(raw)
+    stream = PacketStream(io.BytesIO(raw), scan='headers', errors=errors)
+    packets = []
+    # Export time and uptime of the last version 9 packet of each source ID
+    exporters = {}
+    for packet in stream:
+        end = stream.offset
+        header = packet.header
+        when = export_time(header)
+        if header.version == 9:
+            previous = exporters.get(header.source_id)
+            if previous is not None and header.uptime >= previous[1]:
+                paced = previous[0] + header.uptime - previous[1]
+                if when <= paced < when + 1000:
+                    when = paced
+            exporters[header.source_id] = (when, header.uptime)
+        packets.append((when, view[end - packet_size(packet):end]))
+    return packets
+
+
+def replay(packets, address, mode='original', rate=None, speed=1.0, batch_size=64):
+    """Send packets to a UDP address.
+
+    Parameters:
+        packets : list
+            ``(export time, raw bytes)`` tuples, as returned by
+            ``load_packets``.
+        address : tuple
+            Host and port of the collector.
+        mode : str, optional
+            ``'original'`` (default) to keep the intervals between the export
+            times of packets, divided by ``speed``; ``'rate'`` to send
+            ``rate`` packets per second; or ``'max'`` to send as fast as
+            possible.
+        rate : float, optional
+            Packets per second in the ``'rate'`` mode.
+        speed : float, optional
+            Speed-up of the original pace.
+        batch_size : int, optional
+            Maximum number of packets sent without checking the clock.
+
+    Returns:
+        A dict of the number of ``packets`` and ``bytes`` sent and the
+        ``seconds`` it took.
+    """
+    if mode not in MODES:
+        raise ValueError("invalid replay mode: {}".format(mode))
+    if mode == 'rate' and not (rate and rate > 0):
+        raise ValueError("invalid packet rate: {}".format(rate))
+    if mode == 'original' and not speed > 0:
+        raise ValueError("invalid replay speed: {}".format(speed))
+
+    # Send times relative to the start, in seconds
+    if mode == 'original':
+        first = packets[0][0] if packets else 0
+        delays = [(when - first) / 1000.0 / speed for when, _ in packets]
+    elif mode == 'rate':
+        delays = [i / float(rate) for i in range(len(packets))]
+    else:
+        delays = None
+
+    sent = 0
+    sock = socket.socket(socket.getaddrinfo(address[0], address[1], 0, socket.SOCK_DGRAM)[0][0],
+                         socket.SOCK_DGRAM)
+    try:
+        sock.connect(address)
+        send = sock.send
+        start = time.perf_counter()
+        i = 0
+        while i < len(packets):
+            end = min(i + batch_size, len(packets))
+            if delays is not None:
+                wait = delays[i] - (time.perf_counter() - start)
+                if wait > 0:
+                    time.sleep(wait)
+                # Only the packets that are due go out in this batch
+                now = time.perf_counter() - start
+                end = i + 1
+                while end < len(packets) and end - i < batch_size and delays[end] <= now:
+                    end += 1
+            for _, raw in packets[i:end]:
+                sent += send(raw)
+            i = end
+        seconds = time.perf_counter() - start
+    finally:
+        sock.close()
+    return dict(packets=len(packets), bytes=sent, seconds=seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a NetFlow capture to a collector.")
+    parser.add_argument('path', help="file of NetFlow packets")
+    parser.add_argument('address', help="collector as host:port")
+    parser.add_argument('--rate', type=float, help="packets per second")
+    parser.add_argument('--speed', type=float, default=1.0, help="speed-up of the original pace")
+    parser.add_argument('--max', action='store_true', help="send as fast as possible")
+    args = parser.parse_args(argv)
+
+    host, port = args.address.rsplit(':', 1)
+    with open(args.path, 'rb') as f:
+        packets = load_packets(f)
+    mode = 'max' if args.max else 'rate' if args.rate else 'original'
+    stats = replay(packets, (host.strip('[]'), int(port)), mode, args.rate, args.speed)
+    print("sent {packets} packets ({bytes} bytes) in {seconds:.3f} s".format(**stats))
+
+
+if __name__ == '__main__':
+    main()
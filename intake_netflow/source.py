@@ -1,7 +1,16 @@
-from dask.bytes import open_files
+import bisect
+import collections
+import functools
+import os
 
 from intake.source import base
 from . import __version__
+from .utils import (ERROR_MODES, BlockReader, PacketSampler, TimeWindow, filename_time,
+                    to_milliseconds)
+
+
+FORMATS = ('netflow', 'pcap', 'nfcapd')
+CONTAINERS = ('python', 'dataframe')
 
 
 class NetflowSource(base.DataSource):
@@ -10,44 +19,620 @@ class NetflowSource(base.DataSource):
     container = 'python'
     partition_access = True
 
-    def __init__(self, urlpath, metadata=None):
+    def __init__(self, urlpath, version=None, address=None, timestamps=False,
+                 compression='infer', format='netflow', ports=None, sample=None,
+                 every_nth=None, seed=None, checkpoint=None, container='python', start=None,
+                 end=None, errors='stop', categories=None, metadata=None):
         """Source to load Cisco Netflow packets as sequence of Python dicts.
 
         Parameters:
             urlpath : str
-                Location of the data files; can include protocol and glob 
+                Location of the data files; can include protocol and glob
                 characters.
+            version : int, optional
+                NetFlow version of the packets in the data files, either 5 or
+                9. If None (default), the version of each packet is detected
+                from its header. Records of both versions share the same
+                lowercase field names.
+            address : str, optional
+                Representation of IP address fields: None (default) for
+                integers, ``'uint32'``, ``'bytes16'``, ``'uint64'`` (paired
+                ``_hi``/``_lo`` columns) or ``'str'``.
+            timestamps : bool, optional
+                If True, add absolute ``flow_start`` and ``flow_end`` times
+                and ``flow_duration`` to records, computed from the switching
+                times and the export time of each packet.
+            compression : str, optional
+                Compression of the data files, such as ``'gzip'`` or
+                ``'zstd'``. By default it is inferred from the file extension
+                (e.g. ``.netflow.gz``); use None for uncompressed files.
+            format : str, optional
+                Format of the data files: ``'netflow'`` (default) for raw
+                streams of NetFlow packets, ``'pcap'`` for tcpdump pcap and
+                pcapng captures of UDP datagrams sent to a collector, or
+                ``'nfcapd'`` for files written by nfdump. Each data block of
+                an nfcapd file is read as a separate partition.
+            ports : iterable of int, optional
+                For ``'pcap'`` files, the destination ports of the datagrams
+                holding NetFlow packets. If None, every UDP datagram is read.
+            sample : float, optional
+                Fraction of packets whose records are read, chosen at random.
+                Template flowsets of all packets are still read, but the data
+                flowsets of other packets are skipped without decoding. Not
+                supported for ``'nfcapd'`` files.
+            every_nth : int, optional
+                Read the records of every n-th packet of each file instead of
+                a random sample.
+            seed : int, optional
+                Seed of the random sample; each file uses ``seed`` plus its
+                partition number.
+            checkpoint : str, optional
+                Local path of a checkpoint file for incremental reads of
+                ``'netflow'`` files. Files that are unchanged since the last
+                ``read()`` are left out, and files that grew are read from
+                where the last read stopped, with their templates restored.
+                ``read()`` saves the progress; see ``checkpoint.Checkpoint``.
+            container : str, optional
+                ``'python'`` (default) to read records as dicts, or
+                ``'dataframe'`` to read ``'netflow'`` files into a dataframe
+                indexed by the ``export_time`` of each record's packet. The
+                partitions of ``to_dask()`` then have known divisions when
+                the files cover disjoint time ranges.
+            start, end : optional
+                Export time range of the packets to read, end excluded, as
+                seconds since 0000 UTC 1970, ISO 8601 strings or datetimes.
+                Files whose names carry timestamps (``YYYYmmddHHMM[SS]``, as
+                written by rotating collectors) and files whose packets all
+                lie outside the range are skipped entirely; other packets
+                outside the range only have their templates read. Not
+                supported for ``'nfcapd'`` files.
+            errors : str, optional
+                What to do with a packet of a ``'netflow'`` file that cannot
+                be decoded, such as a corrupt byte range or a truncated last
+                packet: ``'stop'`` (default) ends the file there, ``'raise'``
+                raises the error, and ``'resync'`` skips to the next valid
+                packet and reads on; see ``utils.PacketReader``.
+            categories : iterable of FieldType or str, optional
+                Fields to store as dictionary-encoded categorical columns in
+                dataframes, such as ``FieldType.PROTOCOL`` or
+                ``'input_snmp'``; suited to fields with few distinct values.
+                Names other than those of fields must be columns found in the
+                files, such as ``'ipv4_src_addr_hi'``; others raise
+                ValueError once the files are scanned. Requires the
+                ``'dataframe'`` container, and also applies to
+                ``read_tables()``.
         """
+        if version not in (None, 5, 9):
+            raise ValueError("unsupported NetFlow version: {}".format(version))
+        if format not in FORMATS:
+            raise ValueError("unsupported file format: {}".format(format))
+        if format == 'nfcapd' and (sample is not None or every_nth is not None):
+            raise ValueError("sampling is not supported for nfcapd files")
+        if checkpoint is not None and format != 'netflow':
+            raise ValueError("checkpoints are not supported for format: {}".format(format))
+        if format == 'nfcapd' and (start is not None or end is not None):
+            raise ValueError("time ranges are not supported for nfcapd files")
+        if errors not in ERROR_MODES:
+            raise ValueError("invalid error mode: {}".format(errors))
+        if errors != 'stop' and format != 'netflow':
+            raise ValueError("error modes are not supported for format: {}".format(format))
+        if container not in CONTAINERS:
+            raise ValueError("unsupported container: {}".format(container))
+        if container == 'dataframe' and format != 'netflow':
+            raise ValueError("dataframes are not supported for format: {}".format(format))
+        if categories is not None and container != 'dataframe':
+            raise ValueError("categories require the 'dataframe' container")
+        # Validate the sampling options early
+        PacketSampler(sample, every_nth)
         self._urlpath = urlpath
+        self._compression = compression
+        self._sample = (sample, every_nth, seed)
+        self._checkpoint_path = checkpoint
+        self._checkpoint = None
+        self._templates = {}
+        self._fingerprints = {}
+        self._dtypes = {}
+        self._layouts = {}
+        self._nullable = frozenset()
+        self._categorical = frozenset(getattr(field, 'name', field).lower()
+                                      for field in categories or ())
+        self._bounds = None
+        self._scanned = False
+        self.container = container
+        self._window = (None if start is None else to_milliseconds(start),
+                        None if end is None else to_milliseconds(end))
+        self._kwargs = dict(version=version, address=address, timestamps=timestamps,
+                            format=format, ports=ports, errors=errors)
         super(NetflowSource, self).__init__(metadata=metadata)
 
     def _get_schema(self):
-        self._streams = open_files(self._urlpath, mode='rb')
-        self.npartitions = len(self._streams)
+        from dask.bytes import open_files
+        self._streams = open_files(self._urlpath, mode='rb', compression=self._compression)
+        if self._window != (None, None):
+            self._streams = self._prune_files(self._streams)
+        if self._kwargs['format'] == 'nfcapd':
+            from .nfcapd import block_offsets
+            self._partitions = [(stream, offset)
+                                for stream in self._streams
+                                for offset in block_offsets(stream)]
+        elif self._checkpoint_path is not None:
+            self._partitions = self._plan_increments()
+        else:
+            self._partitions = [(stream, None) for stream in self._streams]
+
+        # Scanning reads every file in full, so it is left to discover() unless
+        # dataframes or the time range depend on it.
+        self._scanned = False
+        dtype, shape = None, None
+        if self._kwargs['format'] == 'netflow' and (self.container == 'dataframe' or
+                                                    self._window != (None, None)):
+            dtype, shape = self._scan_schema()
+        self.npartitions = len(self._partitions)
         return base.Schema(datashape=None,
-                           dtype=None,
-                           shape=None,
-                           npartitions=len(self._streams),
+                           dtype=dtype,
+                           shape=shape,
+                           npartitions=self.npartitions,
                            extra_metadata={})
 
+    def _load_schema(self):
+        """Scan ``'netflow'`` files for the record dtype and count, unless done already."""
+        self._load_metadata()
+        if self._kwargs['format'] == 'netflow' and not self._scanned:
+            self.dtype, self.shape = self._scan_schema()
+
+    def discover(self):
+        self._load_schema()
+        return super(NetflowSource, self).discover()
+
+    def _prune_files(self, streams):
+        """Leave out files whose name shows they precede or follow the time range.
+
+        A file is taken to cover the time from its name's timestamp up to the
+        next later timestamp among the files of its directory, as collectors
+        write the files of each exporter to a directory of their own. Unless
+        every file name has a timestamp, no file is left out.
+        """
+        times = [filename_time(stream.path) for stream in streams]
+        if any(time is None for time in times):
+            return streams
+        start, end = self._window
+        directories = collections.defaultdict(set)
+        for stream, time in zip(streams, times):
+            directories[os.path.dirname(stream.path)].add(time)
+        directories = dict((name, sorted(found)) for name, found in directories.items())
+        keep = []
+        for stream, first in zip(streams, times):
+            found = directories[os.path.dirname(stream.path)]
+            i = bisect.bisect_right(found, first)
+            last = found[i] if i < len(found) else None
+            if (end is None or first < end) and (start is None or last is None or last > start):
+                keep.append(stream)
+        return keep
+
+    def _plan_increments(self):
+        """Select the files and offsets to read since the last checkpoint."""
+        from .checkpoint import Checkpoint
+        self._checkpoint = Checkpoint(self._checkpoint_path)
+        self._templates, self._fingerprints = {}, {}
+        partitions = []
+        for stream in self._streams:
+            info = stream.fs.info(stream.path)
+            mtime = info.get('mtime')
+            if not isinstance(mtime, (int, float)):
+                mtime = str(mtime)
+            compressed = bool(getattr(stream, 'compression', None))
+            start = self._checkpoint.start(stream.path, info['size'], mtime, compressed,
+                                           functools.partial(read_head, stream))
+            if start is None:
+                continue
+            partitions.append((stream, start[0]))
+            self._templates[stream.path] = start[1]
+            head = None if compressed else read_head(stream)
+            self._fingerprints[stream.path] = (info['size'], mtime, head)
+        self._streams = [stream for stream, _ in partitions]
+        return partitions
+
+    def _scan_schema(self):
+        """Derive the record dtype and count from the templates of all files.
+
+        Files are scanned in parallel, skipping data flowsets by their length.
+        Partitions are then ordered by the export time of their packets, if
+        every file has any.
+        """
+        import dask
+        import numpy as np
+        from .columns import union_dtypes
+        from .dispatch import scan_schema
+        dscan = dask.delayed(scan_stream)
+        scans = dask.compute(*[dscan(stream, scan_schema, self._kwargs['address'],
+                                     self._kwargs['timestamps'], offset=offset,
+                                     templates=self._templates.get(stream.path),
+                                     errors=self._kwargs['errors'])
+                               for stream, offset in self._partitions])
+        if self._window != (None, None):
+            # Leave out files without packets in the time range
+            start, end = self._window
+            kept = [(partition, scan) for partition, scan in zip(self._partitions, scans)
+                    if scan[2] is not None and
+                    (start is None or scan[2][1] >= start) and (end is None or scan[2][0] < end)]
+            self._partitions = [partition for partition, _ in kept]
+            self._streams = [stream for stream, _ in self._partitions]
+            scans = [scan for _, scan in kept]
+        if all(scan[2] is not None for scan in scans):
+            # Order partitions by export time, so dataframe divisions are sorted
+            order = sorted(range(len(scans)), key=lambda i: scans[i][2])
+            self._partitions = [self._partitions[i] for i in order]
+            self._streams = [stream for stream, _ in self._partitions]
+            scans = [scans[i] for i in order]
+        schemas = [schema for schemas, _, _ in scans for schema in schemas]
+        self._dtypes = union_dtypes(schemas)
+        self._check_categories()
+        layouts = collections.OrderedDict()
+        for schema in schemas:
+            layouts.setdefault(tuple(schema), []).append(schema)
+        self._layouts = collections.OrderedDict(
+            (signature, union_dtypes(found)) for signature, found in layouts.items())
+        self._nullable = frozenset(name for name in self._dtypes
+                                   if any(name not in schema for schema in schemas))
+        self._bounds = [bounds for _, _, bounds in scans]
+        self._scanned = True
+        dtype = np.dtype(list(self._dtypes.items())) if self._dtypes else None
+        return dtype, (sum(count for _, count, _ in scans),)
+
+    def _check_categories(self):
+        """Check that categorical columns are fields or discovered columns."""
+        from .v9 import FieldType
+        for name in sorted(self._categorical):
+            if name in self._dtypes:
+                continue
+            if name + '_hi' in self._dtypes:
+                raise ValueError("field {0} is split into {0}_hi and {0}_lo columns; "
+                                 "name those as categories".format(name))
+            if name.upper() not in FieldType.__members__:
+                raise ValueError("unknown categorical column: {}".format(name))
+
+    def count(self, by_file=False):
+        """Count data records by source ID and template ID.
+
+        Data payloads are skipped rather than decoded; files are scanned in
+        parallel. Like ``read()``, files are scanned from their checkpoint
+        offsets and only packets within ``start`` and ``end`` are counted;
+        packet sampling is not applied. Only the ``'netflow'`` format is
+        supported.
+
+        Parameters:
+            by_file : bool, optional
+                If True, return the counts of each file separately.
+
+        Returns:
+            A Counter keyed by ``(source_id, template_id)``, or a dict of
+            such counters keyed by file path. Version 5 records are counted
+            under ``(engine_id, None)``.
+        """
+        import dask
+        from .dispatch import count_records
+        if self._kwargs['format'] != 'netflow':
+            raise ValueError("counting is not supported for format: {}".format(self._kwargs['format']))
+        self._load_metadata()
+        window = TimeWindow(*self._window) if self._window != (None, None) else None
+        dcount = dask.delayed(scan_stream)
+        counts = dask.compute(*[dcount(stream, count_records, offset=offset,
+                                       templates=self._templates.get(stream.path),
+                                       window=window, errors=self._kwargs['errors'])
+                                for stream, offset in self._partitions])
+        if by_file:
+            return collections.OrderedDict((stream.path, count)
+                                           for (stream, _), count in zip(self._partitions, counts))
+        return sum(counts, collections.Counter())
+
+    def _sampler(self, i):
+        """Create the packet sampler of a partition, if any."""
+        fraction, every_nth, seed = self._sample
+        sampler = None
+        if fraction is not None or every_nth is not None:
+            sampler = PacketSampler(fraction, every_nth, None if seed is None else seed + i)
+        if self._window != (None, None):
+            sampler = TimeWindow(self._window[0], self._window[1], sampler)
+        return sampler
+
+    def _read_kwargs(self, i):
+        """Keyword arguments of ``read_stream`` for a partition."""
+        stream, offset = self._partitions[i]
+        kwargs = dict(self._kwargs, offset=offset, sampler=self._sampler(i))
+        if self._checkpoint is not None:
+            kwargs['templates'] = self._templates[stream.path]
+        if self.container == 'dataframe':
+            kwargs.update(container='dataframe', meta=self._meta())
+        return kwargs
+
+    def _meta(self):
+        """Empty dataframe with the columns of the merged records."""
+        from .frame import meta_frame
+        return meta_frame(self._dtypes, self._nullable, self._categorical)
+
     def _get_partition(self, i):
-        return read_stream(self._streams[i])
+        return read_stream(self._partitions[i][0], **self._read_kwargs(i))
+
+    def iter_partition(self, i, chunksize=100000):
+        """Iterate over the records of a partition in chunks.
+
+        The file is decoded as it is read, so memory use is bounded by the
+        chunk size rather than the size of the partition; pcap captures are
+        read a frame at a time, and nfcapd files a block at a time.
+
+        Parameters:
+            i : int
+                Number of the partition.
+            chunksize : int, optional
+                Number of records per chunk; the last chunk of the partition
+                may be shorter. Chunks are lists of dicts, or dataframes with
+                the ``'dataframe'`` container.
+        """
+        self._load_metadata()
+        return iter_stream(self._partitions[i][0], chunksize, **self._read_kwargs(i))
+
+    def read_chunked(self, chunksize=100000):
+        """Iterate over the records of all partitions in chunks.
+
+        See ``iter_partition``. With a checkpoint, the progress of each
+        partition is recorded once it is read to its end, and saved once all
+        partitions are read.
+        """
+        self._load_metadata()
+        for i, (stream, _) in enumerate(self._partitions):
+            kwargs = self._read_kwargs(i)
+            if self._checkpoint is None:
+                for chunk in iter_stream(stream, chunksize, **kwargs):
+                    yield chunk
+                continue
+            progress = {}
+            for chunk in iter_increment(stream, chunksize, progress=progress, **kwargs):
+                yield chunk
+            size, mtime, head = self._fingerprints[stream.path]
+            self._checkpoint.update(stream.path, progress['offset'], size, mtime,
+                                    progress['templates'], head)
+        if self._checkpoint is not None:
+            self._checkpoint.save()
 
     def read(self):
-        return self.to_dask().compute()
+        if self._checkpoint_path is None:
+            return self.to_dask().compute()
+
+        import dask
+        self._load_metadata()
+        dread = dask.delayed(read_increment)
+        parts = dask.compute(*[dread(stream, **self._read_kwargs(i))
+                               for i, (stream, _) in enumerate(self._partitions)])
+        data = []
+        for (stream, _), (records, offset, templates) in zip(self._partitions, parts):
+            size, mtime, head = self._fingerprints[stream.path]
+            self._checkpoint.update(stream.path, offset, size, mtime, templates, head)
+            data.append(records)
+        self._checkpoint.save()
+        if self.container == 'dataframe':
+            from .frame import concat_frames
+            return concat_frames(data or [self._meta()]).sort_index(kind='mergesort')
+        return [record for records in data for record in records]
+
+    def read_tables(self):
+        """Read the records of ``'netflow'`` files into a dataframe per layout.
+
+        Records of templates with the same columns share a table, which is
+        dense and keeps the dtypes of its columns; see
+        ``frame.packets_to_tables``. ``frame.merge_tables`` combines them
+        into a single dataframe with explicit nulls. Checkpoint progress is
+        not saved.
+
+        Returns:
+            A dict of dataframes indexed and sorted by ``export_time``, keyed
+            by the tuple of column names of each layout.
+        """
+        import dask
+        from .frame import concat_frames, meta_frame
+        if self._kwargs['format'] != 'netflow':
+            raise ValueError("tables are not supported for format: {}".format(self._kwargs['format']))
+        self._load_schema()
+        metas = collections.OrderedDict(
+            (signature, meta_frame(dtypes, categorical=self._categorical))
+            for signature, dtypes in self._layouts.items())
+        dread = dask.delayed(read_stream)
+        parts = dask.compute(*[dread(stream, **dict(self._read_kwargs(i), container='tables',
+                                                    meta=metas))
+                               for i, (stream, _) in enumerate(self._partitions)])
+        tables = collections.OrderedDict(metas)
+        for signature in tables:
+            frames = [part[signature] for part in parts if len(part.get(signature, ()))]
+            if frames:
+                tables[signature] = concat_frames(frames).sort_index(kind='mergesort')
+        return tables
 
     def to_dask(self):
         import dask.delayed
+        self._load_metadata()
+        if self.container == 'dataframe':
+            return self._to_dask_dataframe()
+
         import dask.bag as db
         dpart = dask.delayed(read_stream)
-        parts = [dpart(stream) for stream in self._streams]
+        parts = [dpart(stream, **self._read_kwargs(i))
+                 for i, (stream, _) in enumerate(self._partitions)]
         return db.from_delayed(parts)
 
+    def _to_dask_dataframe(self):
+        """Create a dask dataframe with partitions ordered by export time."""
+        import dask.delayed
+        import dask.dataframe as dd
+        from dask.dataframe.utils import clear_known_categories
+        from .frame import divisions
+        dpart = dask.delayed(read_stream)
+        parts = [dpart(stream, **self._read_kwargs(i))
+                 for i, (stream, _) in enumerate(self._partitions)]
+        # Categories differ between partitions
+        meta = clear_known_categories(self._meta())
+        return dd.from_delayed(parts, meta=meta, divisions=divisions(self._bounds))
+
     def _close(self):
         self._streams = None
+        self._partitions = None
+
+
+def record_stream(source, version=None, address=None, timestamps=False, format='netflow',
+                  ports=None, offset=None, sampler=None, errors='stop'):
+    """Create a stream of data records for the given file format and version."""
+    if format == 'nfcapd':
+        from .nfcapd import RecordStream
+        return RecordStream(source, offset=offset, address=address, timestamps=timestamps)
+    if format == 'pcap':
+        from .pcap import RecordStream
+        return RecordStream(source, ports=ports, address=address, timestamps=timestamps,
+                            sampler=sampler)
+    if version == 5:
+        from .v5 import RecordStream
+    elif version == 9:
+        from .v9 import RecordStream
+    else:
+        from .dispatch import RecordStream
+    return RecordStream(source, address=address, timestamps=timestamps, sampler=sampler,
+                        errors=errors)
+
+
+def packet_stream(source, version=None, sampler=None, errors='stop'):
+    """Create a stream of NetFlow packets for the given version."""
+    if version == 5:
+        from .v5 import PacketStream
+    elif version == 9:
+        from .v9 import PacketStream
+    else:
+        from .dispatch import PacketStream
+    return PacketStream(source, sampler=sampler, errors=errors)
+
+
+def read_head(stream):
+    """Read the first bytes of a file, whose digest a checkpoint keeps."""
+    from .checkpoint import HEAD_SIZE
+    with stream as f:
+        return f.read(HEAD_SIZE)
+
 
+def scan_stream(stream, func, *args, **kwargs):
+    """Open a file and apply a scanning function, such as ``dispatch.scan_schema``.
 
-def read_stream(stream):
-    from .v9 import RecordStream
+    The file is read from ``offset``, if given; other arguments are passed to
+    the function.
+    """
+    offset = kwargs.pop('offset', None)
     with stream as f:
-        return list(RecordStream(f))
+        if offset:
+            f.seek(offset)
+        if not getattr(stream, 'compression', None):
+            return func(f, *args, **kwargs)
+        # Decompressors cannot seek backwards to peek at packet versions.
+        with BlockReader(f) as source:
+            return func(source, *args, **kwargs)
+
+
+def iter_chunks(records, chunksize=None):
+    """Group records into lists of up to ``chunksize``, or a single list if None."""
+    import itertools
+    if chunksize is None:
+        yield list(records)
+        return
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_increment(stream, chunksize=None, offset=None, templates=None, container='python',
+                   meta=None, progress=None, **kwargs):
+    """Iterate over the records of a NetFlow file from an offset on, in chunks.
+
+    Parameters:
+        stream : OpenFile
+            File to read.
+        chunksize : int, optional
+            Number of records per chunk. If None, a single chunk of all
+            records is yielded.
+        offset : int, optional
+            Offset of the first packet to read.
+        templates : dict, optional
+            Template records known before the first packet.
+        container : str, optional
+            ``'python'`` for lists of dicts, ``'dataframe'``, or ``'tables'``
+            for a single chunk of a dataframe per record layout.
+        meta : pandas.DataFrame or dict, optional
+            Columns and dtypes of the dataframes; see
+            ``frame.packets_to_frame``. For ``'tables'``, a dict of such
+            dataframes keyed by layout; see ``frame.packets_to_tables``.
+        progress : dict, optional
+            Once the file is read to its end, set to the ``offset`` after the
+            last complete packet and the ``templates`` known at that point.
+    """
+    with stream as f:
+        if offset:
+            f.seek(offset)
+        with BlockReader(f) as source:
+            if container in ('dataframe', 'tables'):
+                from .frame import iter_frames, packets_to_tables
+                packets = packet_stream(source, kwargs.get('version'), kwargs.get('sampler'),
+                                        kwargs.get('errors', 'stop'))
+                cache = getattr(packets, 'templates', {})
+                cache.update(templates or {})
+                address, timestamps = kwargs.get('address'), kwargs.get('timestamps', False)
+                if container == 'tables':
+                    chunks = [packets_to_tables(packets, address, timestamps, meta)]
+                else:
+                    chunks = iter_frames(packets, chunksize, address, timestamps, meta)
+            else:
+                packets = record_stream(source, **kwargs)
+                cache = getattr(packets, 'templates', {})
+                cache.update(templates or {})
+                chunks = iter_chunks(packets, chunksize)
+            for chunk in chunks:
+                yield chunk
+            if progress is not None:
+                progress.update(offset=(offset or 0) + packets.offset, templates=dict(cache))
+
+
+def read_increment(stream, offset=None, templates=None, container='python', meta=None,
+                   **kwargs):
+    """Read the records of a NetFlow file from an offset on.
+
+    Parameters are the same as for ``iter_increment``.
+
+    Returns:
+        A tuple of the records, the offset after the last complete packet and
+        the template records known at that point.
+    """
+    progress = {}
+    data, = iter_increment(stream, None, offset, templates, container, meta, progress, **kwargs)
+    return data, progress['offset'], progress['templates']
+
+
+def iter_stream(stream, chunksize=None, **kwargs):
+    """Iterate over the records of a partition in chunks of up to ``chunksize``.
+
+    Keyword arguments are those of ``read_stream``; records are decoded while
+    the file is read, so only a chunk of them is held at once, along with a
+    frame of a pcap capture or a block of an nfcapd file.
+    """
+    if kwargs.get('format') == 'netflow':
+        for chunk in iter_increment(stream, chunksize, **kwargs):
+            yield chunk
+        return
+    if kwargs.get('format') == 'nfcapd':
+        # Blocks are located by seeking, which the read-ahead reader cannot do.
+        with stream as f:
+            for chunk in iter_chunks(record_stream(f, **kwargs), chunksize):
+                yield chunk
+        return
+    with stream as f, BlockReader(f) as source:
+        for chunk in iter_chunks(record_stream(source, **kwargs), chunksize):
+            yield chunk
+
+
+def read_stream(stream, **kwargs):
+    data, = iter_stream(stream, **kwargs)
+    return data
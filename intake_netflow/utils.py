@@ -1,3 +1,33 @@
+import collections
+import datetime
+import io
+import numbers
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+
+def read_exactly(source, size):
+    """Read a number of bytes from stream.
+
+    Raises EOFError if the stream ends first, e.g. within a packet that is
+    still being written.
+
+    Parameters:
+        source : file-like object
+            Read-only input stream.
+        size : int
+            Number of bytes to read.
+    """
+    raw = source.read(size)
+    if len(raw) < size:
+        raise EOFError("expected {} bytes, got {}".format(size, len(raw)))
+    return raw
+
+
 def read_and_unpack(source, obj):
     """Read and deserialize structure from stream.
 
@@ -7,4 +37,475 @@ def read_and_unpack(source, obj):
         obj : struct.Struct
             Deserialization struct.
     """
-    return obj.unpack(source.read(obj.size))
+    return obj.unpack(read_exactly(source, obj.size))
+
+
+def peek(source, size, exact=True):
+    """Read bytes from stream without advancing its position.
+
+    Raises EOFError if fewer than ``size`` bytes are left.
+
+    Parameters:
+        source : file-like object
+            Seekable read-only input stream.
+        size : int
+            Number of bytes to read.
+        exact : bool, optional
+            If False, return the bytes that are left instead of raising.
+    """
+    if isinstance(source, BlockReader):
+        raw = source.peek(size)
+    else:
+        loc = source.tell()
+        raw = source.read(size)
+        source.seek(loc)
+    if exact and len(raw) < size:
+        raise EOFError("expected {} bytes, got {}".format(size, len(raw)))
+    return raw
+
+
+def skip(source, size):
+    """Advance stream by a number of bytes without returning them.
+
+    Raises EOFError if the stream ends first, as ``read_exactly`` does; files
+    can be sought past their end, so the last skipped byte is read to check
+    that it exists.
+
+    Parameters:
+        source : file-like object
+            Read-only input stream. Streams that cannot seek are read instead.
+        size : int
+            Number of bytes to skip.
+    """
+    if size <= 0:
+        return
+    try:
+        source.seek(size - 1, io.SEEK_CUR)
+    except (AttributeError, OSError):
+        read_exactly(source, size)
+        return
+    if not source.read(1):
+        raise EOFError("expected {} bytes, got fewer".format(size))
+
+
+def follow(source, decode, poll_interval=1.0, timeout=None):
+    """Decode the next packet of a file that is still being written.
+
+    If the file ends before the packet does, the stream is rewound to the
+    start of the packet and decoding is retried once more bytes may have been
+    appended.
+
+    Parameters:
+        source : file-like object
+            Seekable read-only input stream.
+        decode : callable
+            Decodes a packet from ``source``, raising EOFError at its end.
+        poll_interval : float, optional
+            Seconds to wait between retries.
+        timeout : float, optional
+            Seconds to wait for a complete packet before giving up with
+            EOFError. If None, wait indefinitely.
+    """
+    offset = source.tell()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            return decode(source)
+        except EOFError:
+            source.seek(offset)
+            if deadline is not None and time.monotonic() + poll_interval > deadline:
+                raise
+            time.sleep(poll_interval)
+
+
+# Maximum size of a packet, as carried by a single UDP datagram
+MAX_PACKET_SIZE = 65535
+
+ERROR_MODES = ('stop', 'raise', 'resync')
+
+
+class PacketReader(object):
+    """Base class of streams that read one packet at a time.
+
+    Subclasses implement ``decode`` for a single packet, returning None for
+    packets that are skipped rather than decoded, and list the byte strings
+    that packets start with, i.e. their encoded versions, in ``markers``.
+    The offset of the end of the last complete packet read is kept in
+    ``offset``, and ``stats`` counts the ``packets`` read, the decoding
+    ``errors`` that ended the stream, and, when resynchronizing, the corrupt
+    regions skipped (``resyncs``) and their total ``skipped_bytes``.
+
+    Parameters:
+        source : file-like object
+            Read-only input for packets.
+        follow : bool, optional
+            If True, the source is a file that is still being written. At its
+            end, the stream waits for packets to be appended rather than
+            stopping, and packets cut off by the end of the file are read
+            again once complete; see ``follow``.
+        poll_interval : float, optional
+            Seconds between checks for new packets when following.
+        timeout : float, optional
+            Seconds to wait for a new packet when following before the stream
+            stops. If None (default), wait indefinitely.
+        errors : str, optional
+            What to do with a packet that cannot be decoded: ``'stop'``
+            (default) ends the stream, ``'raise'`` raises the error, and
+            ``'resync'`` skips ahead to the next offset at which a packet
+            decodes and passes its ``validate`` checks, then goes on from
+            there. A truncated final packet is skipped likewise.
+            Resynchronizing reads each packet from a copy of up to
+            ``MAX_PACKET_SIZE`` bytes, so it is slower, and it cannot be
+            combined with ``follow``.
+    """
+
+    markers = ()
+
+    def __init__(self, source, follow=False, poll_interval=1.0, timeout=None, errors='stop'):
+        if errors not in ERROR_MODES:
+            raise ValueError("invalid error mode: {}".format(errors))
+        if follow and errors == 'resync':
+            raise ValueError("cannot resynchronize a stream that is followed")
+        self._source = source
+        self._follow = follow
+        self._poll_interval = poll_interval
+        self._timeout = timeout
+        self._errors = errors
+        self.offset = source.tell()
+        self.stats = collections.Counter()
+
+    def decode(self, source):
+        """Decode the next packet from a stream."""
+        raise NotImplementedError
+
+    def read_packet(self):
+        """Read the next packet, raising StopIteration at the end of the stream."""
+        packet = None
+        while packet is None:
+            try:
+                if self._errors == 'resync':
+                    packet = self._resync()
+                elif self._follow:
+                    packet = follow(self._source, self.decode, self._poll_interval, self._timeout)
+                else:
+                    packet = self.decode(self._source)
+            except Exception as e:
+                # The stream ends cleanly only at a packet boundary
+                if not isinstance(e, EOFError) or self._source.tell() != self.offset:
+                    self.stats['errors'] += 1
+                    if self._errors == 'raise':
+                        raise
+                raise StopIteration
+            # Skipped packets are complete too
+            self.offset = self._source.tell()
+        self.stats['packets'] += 1
+        return packet
+
+    def _resync(self):
+        """Decode the next valid packet, skipping bytes that do not decode."""
+        resynced = False
+        while True:
+            window = peek(self._source, MAX_PACKET_SIZE, exact=False)
+            if not window:
+                raise EOFError("end of stream")
+            buf = io.BytesIO(window)
+            try:
+                packet = self.decode(buf)
+                if packet is not None:
+                    packet.validate()
+                # Payloads skipped by seeking may overrun the window
+                if buf.tell() > len(window):
+                    raise EOFError("packet extends past the end of the stream")
+            except Exception:
+                pass
+            else:
+                skip(self._source, buf.tell())
+                return packet
+
+            if not resynced:
+                self.stats['resyncs'] += 1
+                resynced = True
+            # Jump to the next marker, or past the window if there is none
+            size = self._find_marker(window, 1)
+            if size is None:
+                size = len(window) if len(window) < MAX_PACKET_SIZE else len(window) - 1
+            self.stats['skipped_bytes'] += size
+            read_exactly(self._source, size)
+            self.offset = self._source.tell()
+
+    def _find_marker(self, window, start):
+        """Return the offset of the first marker at or after ``start``, or None."""
+        found = [window.find(marker, start) for marker in self.markers]
+        found = [offset for offset in found if offset >= 0]
+        return min(found) if found else None
+
+    def __next__(self):
+        return self.next()
+
+    def __iter__(self):
+        return self
+
+    def close(self):
+        return self._source.close()
+
+
+class RecordQueue(object):
+    """Mixin of streams that read data records one at a time.
+
+    It goes before a packet stream among the bases of a class. Each batch
+    returned by the stream's ``next``, such as a decoded packet, is turned
+    into records with ``records`` and queued, and records are handed out
+    from the queue. Subclasses set ``_address`` and ``_timestamps``, used
+    by the default ``records``, from the parameters below.
+
+    Parameters:
+        address : str, optional
+            Representation of IP address fields; see
+            ``columns.convert_addresses``.
+        timestamps : bool, optional
+            If True, add ``flow_start``, ``flow_end`` and ``flow_duration``
+            fields; see ``columns.add_timestamps``.
+        sampler : callable, optional
+            Chooses the packets whose records are read; see
+            ``PacketSampler``.
+    """
+
+    _queue = None
+
+    def records(self, packet):
+        """Return the data records of a batch read from the stream."""
+        return packet.iter_records(self._address, self._timestamps)
+
+    def next(self):
+        if self._queue is None:
+            self._queue = collections.deque()
+        while len(self._queue) == 0:
+            self._queue.extend(self.records(super(RecordQueue, self).next()))
+
+        return self._queue.popleft()
+
+    def close(self):
+        self._queue = None
+        return super(RecordQueue, self).close()
+
+def export_time(header):
+    """Export time of a packet in milliseconds since 0000 UTC 1970."""
+    return header.datetime * 1000 + getattr(header, 'nanoseconds', 0) // 1000000
+
+
+def to_milliseconds(value):
+    """Convert a point in time to milliseconds since 0000 UTC 1970.
+
+    Parameters:
+        value : number, str, datetime, numpy.datetime64 or pandas.Timestamp
+            Numbers, including NumPy scalars, are seconds since 0000 UTC 1970;
+            strings are ISO 8601 times. Times without a time zone are taken
+            as UTC.
+    """
+    if isinstance(value, numbers.Real):
+        return int(value * 1000)
+    import pandas as pd
+    value = pd.Timestamp(value)
+    if value.tzinfo is not None:
+        value = value.tz_convert('UTC').tz_localize(None)
+    return value.value // 1000000
+
+
+# Timestamps in rotated file names, e.g. nfcapd.201801021430 or
+# flows-20180102143000.netflow
+FILENAME_TIME = re.compile(r'(?<!\d)(\d{14}|\d{12})(?!\d)')
+
+
+def filename_time(path):
+    """Return the time in a file name in milliseconds, or None if it has none.
+
+    The last run of 12 (``YYYYmmddHHMM``) or 14 (``YYYYmmddHHMMSS``) digits in
+    the name is taken as a UTC time, as written by collectors rotating files.
+    """
+    found = FILENAME_TIME.findall(os.path.basename(path))
+    if not found:
+        return None
+    digits = found[-1]
+    try:
+        value = datetime.datetime.strptime(digits, '%Y%m%d%H%M%S' if len(digits) == 14 else '%Y%m%d%H%M')
+    except ValueError:
+        return None
+    return to_milliseconds(value)
+
+
+class TimeWindow(object):
+    """Choose the packets exported within a time range.
+
+    Parameters:
+        start : int, optional
+            First export time to choose, in milliseconds since 0000 UTC 1970.
+        end : int, optional
+            Export time to stop at (exclusive), in milliseconds.
+        sampler : callable, optional
+            Further choice among the packets within the range, such as a
+            ``PacketSampler``.
+    """
+
+    def __init__(self, start=None, end=None, sampler=None):
+        self.start = start
+        self.end = end
+        self.sampler = sampler
+
+    def __call__(self, header):
+        time = export_time(header)
+        if self.start is not None and time < self.start:
+            return False
+        if self.end is not None and time >= self.end:
+            return False
+        return self.sampler is None or self.sampler(header)
+
+
+class PacketSampler(object):
+    """Choose the packets of a stream whose data records are decoded.
+
+    The sampler is called with the header of each packet, in stream order,
+    and returns True for chosen packets. Packets that are not chosen are
+    still read for their templates.
+
+    Parameters:
+        fraction : float, optional
+            Probability that a packet is chosen.
+        every_nth : int, optional
+            Choose every n-th packet, starting with the first.
+        seed : int, optional
+            Seed of the random choice with ``fraction``.
+    """
+
+    def __init__(self, fraction=None, every_nth=None, seed=None):
+        if fraction is not None and every_nth is not None:
+            raise ValueError("fraction and every_nth are mutually exclusive")
+        if fraction is not None and not 0 < fraction <= 1:
+            raise ValueError("invalid sample fraction: {}".format(fraction))
+        if every_nth is not None and every_nth < 1:
+            raise ValueError("invalid sample interval: {}".format(every_nth))
+        self.fraction = fraction
+        self.every_nth = every_nth
+        self._random = random.Random(seed)
+        self._index = 0
+
+    def __call__(self, header=None):
+        index = self._index
+        self._index += 1
+        if self.every_nth is not None:
+            return index % self.every_nth == 0
+        if self.fraction is not None:
+            return self._random.random() < self.fraction
+        return True
+
+
+class BlockReader(object):
+    """Read-only stream that reads ahead in large blocks on a background thread.
+
+    Blocks are read from the wrapped stream while earlier blocks are decoded,
+    so decompression of compressed input overlaps with decoding. Seeking is
+    supported forwards and backwards within the current block; seeking past
+    the end of the stream raises EOFError.
+
+    Parameters:
+        source : file-like object
+            Read-only input stream.
+        block_size : int, optional
+            Number of bytes requested from the wrapped stream per read.
+        prefetch : int, optional
+            Number of blocks read ahead of the decoder.
+    """
+
+    def __init__(self, source, block_size=4 * 2**20, prefetch=2):
+        self._source = source
+        self._block_size = block_size
+        self._queue = queue.Queue(prefetch)
+        self._buffer = b''
+        self._pos = 0
+        self._offset = 0
+        self._eof = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._read_ahead)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _read_ahead(self):
+        try:
+            while not self._closed:
+                block = self._source.read(self._block_size)
+                self._queue.put(block)
+                if not block:
+                    break
+        except Exception as e:
+            self._queue.put(e)
+
+    def _fill(self, size):
+        """Buffer at least ``size`` unread bytes unless the stream ends."""
+        chunks = [self._buffer[self._pos:]]
+        available = len(chunks[0])
+        while available < size and not self._eof:
+            block = self._queue.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self._eof = True
+            chunks.append(block)
+            available += len(block)
+        self._offset += self._pos
+        self._buffer = b''.join(chunks)
+        self._pos = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = float('inf')
+        if len(self._buffer) - self._pos < size:
+            self._fill(size)
+        end = min(self._pos + size, len(self._buffer))
+        raw = self._buffer[self._pos:end]
+        self._pos = end
+        return raw
+
+    def peek(self, size):
+        if len(self._buffer) - self._pos < size:
+            self._fill(size)
+        return self._buffer[self._pos:self._pos + size]
+
+    def tell(self):
+        return self._offset + self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("can only seek relative to start or current position")
+        if offset < self._offset:
+            raise io.UnsupportedOperation("cannot seek before the current block")
+        while offset > self._offset + len(self._buffer) and not self._eof:
+            self._pos = len(self._buffer)
+            self._fill(1)
+        if offset > self._offset + len(self._buffer):
+            self._pos = len(self._buffer)
+            raise EOFError("cannot seek past the end of the stream")
+        self._pos = offset - self._offset
+        return self.tell()
+
+    def seekable(self):
+        return False
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self._closed = True
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._buffer = b''
+        return self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
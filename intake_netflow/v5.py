@@ -0,0 +1,279 @@
+"""Implementation for Cisco's NetFlow Version 5 flow-record format.
+
+Unlike Version 9, a Version 5 packet has a fixed layout: a 24-byte header
+followed by ``count`` flow records of 48 bytes each::
+
+    +--------+--------+--------+-----+--------+
+    | Header | Record | Record | ... | Record |
+    +--------+--------+--------+-----+--------+
+
+Because every record has the same layout, the records of a packet are decoded
+with a single NumPy structured-dtype view over the payload; no templates are
+involved. Record fields are named after their Version 9 equivalents, so records
+from both versions share the same keys.
+
+The full documentation of this protocol is `NetflowV5`_.
+
+.. _NetflowV5:
+   https://www.cisco.com/c/en/us/td/docs/net_mgmt/netflow_collection_engine/3-6/user/guide/format.html
+"""
+
+import collections
+import struct
+import time
+
+import attr
+import numpy as np
+
+from .columns import add_timestamps, convert_addresses, to_records
+from .utils import PacketReader, RecordQueue, read_and_unpack, read_exactly, skip
+from .v9 import SCAN_MODES, FieldType
+
+
+s_header = struct.Struct("!HHIIIIBBH")
+
+RECORD_LENGTH = 48
+
+# Maximum number of records per packet
+MAX_RECORDS = 30
+
+# (field type, big-endian dtype, byte offset); the 1-byte pad at offset 36 and
+# the 2-byte pad at offset 46 are left out of the view.
+RECORD_FIELDS = [
+    (FieldType.IPV4_SRC_ADDR, '>u4', 0),
+    (FieldType.IPV4_DST_ADDR, '>u4', 4),
+    (FieldType.IPV4_NEXT_HOP, '>u4', 8),
+    (FieldType.INPUT_SNMP, '>u2', 12),
+    (FieldType.OUTPUT_SNMP, '>u2', 14),
+    (FieldType.IN_PKTS, '>u4', 16),
+    (FieldType.IN_BYTES, '>u4', 20),
+    (FieldType.FIRST_SWITCHED, '>u4', 24),
+    (FieldType.LAST_SWITCHED, '>u4', 28),
+    (FieldType.L4_SRC_PORT, '>u2', 32),
+    (FieldType.L4_DST_PORT, '>u2', 34),
+    (FieldType.TCP_FLAGS, 'u1', 37),
+    (FieldType.PROTOCOL, 'u1', 38),
+    (FieldType.SRC_TOS, 'u1', 39),
+    (FieldType.SRC_AS, '>u2', 40),
+    (FieldType.DST_AS, '>u2', 42),
+    (FieldType.SRC_MASK, 'u1', 44),
+    (FieldType.DST_MASK, 'u1', 45),
+]
+
+record_dtype = np.dtype({
+    'names': [ftype.name.lower() for ftype, _, _ in RECORD_FIELDS],
+    'formats': [fmt for _, fmt, _ in RECORD_FIELDS],
+    'offsets': [offset for _, _, offset in RECORD_FIELDS],
+    'itemsize': RECORD_LENGTH,
+})
+
+
+@attr.s(slots=True, frozen=True)
+class Header(object):
+    """Packet metadata.
+
+    Parameters:
+        version : int, optional
+            The version of NetFlow records exported in a packet (defaults to 5).
+        count : int, optional
+            Number of flow records contained within a packet.
+        uptime : int, optional
+            Time in milliseconds since an export device was first booted.
+        datetime : int, optional
+            Seconds since 0000 Coordinated Universal Time (UTC) 1970.
+        nanoseconds : int, optional
+            Residual nanoseconds since 0000 UTC 1970.
+        sequence : int, optional
+            Sequence counter of total flows seen by an export device.
+        engine_type : int, optional
+            Type of flow-switching engine.
+        engine_id : int, optional
+            Slot number of the flow-switching engine.
+        sampling_interval : int, optional
+            Sampling mode (first two bits) and interval (remaining 14 bits).
+    """
+
+    version = attr.ib(type=int, default=5)
+    count = attr.ib(type=int, default=0)
+    uptime = attr.ib(type=int, default=0)
+    datetime = attr.ib(type=int)
+    nanoseconds = attr.ib(type=int, default=0)
+    sequence = attr.ib(type=int, default=0)
+    engine_type = attr.ib(type=int, default=0)
+    engine_id = attr.ib(type=int, default=0)
+    sampling_interval = attr.ib(type=int, default=0)
+
+    @datetime.default
+    def current_unix_seconds(self):
+        return int(time.time())
+
+    @staticmethod
+    def decode(source):
+        header = Header(*read_and_unpack(source, s_header))
+        if header.version != 5:
+            raise ValueError("not a NetFlow Version 5 packet: version {}".format(header.version))
+        return header
+
+    def encode(self):
+        return s_header.pack(self.version,
+                             self.count,
+                             self.uptime,
+                             self.datetime,
+                             self.nanoseconds,
+                             self.sequence,
+                             self.engine_type,
+                             self.engine_id,
+                             self.sampling_interval)
+
+
+class ExportPacket(object):
+    """A packet containing IP flows sent from a router to a collector.
+
+    Parameters:
+        records : numpy.ndarray or list
+            Either a structured array of ``record_dtype`` or a list of decoded
+            data records, ordered as the fields of ``record_dtype``.
+        header : Header, optional
+            Packet metadata for given records. If None, then a header with
+            reasonable defaults is created.
+    """
+
+    __slots__ = ('header', 'records')
+
+    def __init__(self, records, header=None):
+        if not isinstance(records, np.ndarray):
+            records = np.array([tuple(record) for record in records], dtype=record_dtype)
+        self.header = header if header else Header(count=len(records))
+        self.records = records
+
+    def __len__(self):
+        return s_header.size + len(self.records) * RECORD_LENGTH
+
+    def count(self):
+        """Count data records by engine ID.
+
+        Version 5 has no templates, so records are counted under template ID
+        None, with the engine ID in place of a source ID.
+
+        Returns:
+            A Counter keyed by ``(engine_id, None)``.
+        """
+        counts = collections.Counter()
+        if self.header.count:
+            counts[self.header.engine_id, None] = self.header.count
+        return counts
+
+    def validate(self):
+        """Raise ValueError if the packet is implausible.
+
+        Used to tell packets from other bytes when resynchronizing a stream;
+        see ``utils.PacketReader``.
+        """
+        if not 0 < self.header.count <= MAX_RECORDS:
+            raise ValueError("invalid record count: {}".format(self.header.count))
+
+    def iter_columns(self, address=None, timestamps=False):
+        """Iterate over the columns of the packet's records.
+
+        Parameters:
+            address : str, optional
+                Representation of IP address fields; see
+                ``columns.convert_addresses``.
+            timestamps : bool, optional
+                If True, add absolute flow times; see
+                ``columns.add_timestamps``.
+        """
+        columns = collections.OrderedDict()
+        for name in record_dtype.names:
+            column = self.records[name]
+            columns[name] = column.astype(column.dtype.newbyteorder('='))
+        columns = convert_addresses(columns, address)
+        if timestamps:
+            columns = add_timestamps(columns, self.header.uptime, self.header.datetime,
+                                     self.header.nanoseconds // 1000000)
+        yield columns
+
+    def iter_records(self, address=None, timestamps=False):
+        """Iterate over data records as dicts keyed by lowercase field name.
+
+        Parameters are the same as for ``iter_columns``.
+        """
+        for columns in self.iter_columns(address, timestamps):
+            for record in to_records(columns):
+                yield record
+
+    @staticmethod
+    def decode(source, scan=None, select=None):
+        header = Header.decode(source)
+        if scan or (select is not None and not select(header)):
+            # Only the header is kept; it still holds the record count.
+            skip(source, header.count * RECORD_LENGTH)
+            return ExportPacket(np.empty(0, dtype=record_dtype), header=header)
+        payload = read_exactly(source, header.count * RECORD_LENGTH)
+        records = np.frombuffer(payload, dtype=record_dtype, count=header.count)
+        return ExportPacket(records, header=header)
+
+    def encode(self):
+        records = np.zeros(len(self.records), dtype=record_dtype)
+        records[...] = self.records
+        return self.header.encode() + records.tobytes()
+
+
+class PacketStream(PacketReader):
+    """A read-only representation of serialized packets.
+
+    The offset of the end of the last complete packet read is kept in
+    ``offset``, and counts of packets read and skipped in ``stats``.
+
+    Parameters:
+        source : file-like object
+            Read-only input for packets.
+        scan : str, optional
+            If ``'templates'`` or ``'headers'``, only packet headers are
+            decoded and records are skipped.
+        sampler : callable, optional
+            Called with the header of each packet; the records of packets for
+            which it returns False are skipped. See ``utils.PacketSampler``
+            and ``utils.TimeWindow``.
+        follow, poll_interval, timeout, errors : optional
+            Options for files that are still being written, and for packets
+            that cannot be decoded; see ``utils.PacketReader``.
+    """
+
+    markers = (struct.pack("!H", 5),)
+
+    def __init__(self, source, scan=None, sampler=None, follow=False, poll_interval=1.0,
+                 timeout=None, errors='stop'):
+        if scan not in SCAN_MODES:
+            raise ValueError("invalid scan mode: {}".format(scan))
+        super(PacketStream, self).__init__(source, follow, poll_interval, timeout, errors)
+        self._scan = scan
+        self._sampler = sampler
+
+    def decode(self, source):
+        return ExportPacket.decode(source, self._scan, self._sampler)
+
+    def next(self):
+        return self.read_packet()
+
+
+class RecordStream(RecordQueue, PacketStream):
+    """A read-only representation of serialized data records.
+
+    Parameters:
+        source : file-like object
+            Read-only input for data records.
+        address, timestamps, sampler : optional
+            Decoding of the records; see ``utils.RecordQueue``.
+        follow, poll_interval, timeout, errors : optional
+            Options for files that are still being written, and for packets
+            that cannot be decoded; see ``utils.PacketReader``.
+    """
+
+    def __init__(self, source, address=None, timestamps=False, sampler=None, follow=False,
+                 poll_interval=1.0, timeout=None, errors='stop'):
+        super(RecordStream, self).__init__(source, sampler=sampler, follow=follow,
+                                           poll_interval=poll_interval, timeout=timeout,
+                                           errors=errors)
+        self._address = address
+        self._timestamps = timestamps
@@ -18,21 +18,26 @@ The full documentation of this protocol is `NetflowV9`_.
    https://www.cisco.com/en/US/technologies/tk648/tk362/technologies_white_paper09186a00800a3db9.pdf
 """
 
+import collections
 import functools
-import io
 import struct
 import time
 
 import attr
 import enum
+import numpy as np
 
-from .utils import read_and_unpack
+from .columns import add_timestamps, convert_addresses, to_records
+from .jit import fold_fields
+from .utils import PacketReader, RecordQueue, peek, read_and_unpack, read_exactly, skip
 
 
 s_header = struct.Struct("!HHIIII")
 s_flowset = struct.Struct("!H")
 s_type_length = struct.Struct("!HH")
 
+SCAN_MODES = (None, 'templates', 'headers')
+
 
 class FieldType(enum.Enum):
     IN_BYTES = (1, int)
@@ -136,7 +141,36 @@ class FieldType(enum.Enum):
         return obj
 
 
-@attr.s
+@attr.s(slots=True, frozen=True)
+class UnknownFieldType(object):
+    """A field type missing from ``FieldType``, such as a vendor-specific one.
+
+    Values of unknown fields are decoded as big-endian integers if they are at
+    most 8 bytes long, and as raw bytes otherwise.
+
+    Parameters:
+        value : int
+            Field type ID.
+    """
+
+    value = attr.ib(type=int)
+    dtype = None
+
+    @property
+    def name(self):
+        return 'FIELD_{}'.format(self.value)
+
+
+FIELD_TYPES = {ftype.value: ftype for ftype in FieldType}
+
+
+def field_type(value):
+    """Look up the field type of the given ID, known or not."""
+    ftype = FIELD_TYPES.get(value)
+    return ftype if ftype is not None else UnknownFieldType(value)
+
+
+@attr.s(slots=True, frozen=True)
 class Header(object):
     """Packet metadata.
 
@@ -168,7 +202,10 @@ class Header(object):
 
     @staticmethod
     def decode(source):
-        return Header(*read_and_unpack(source, s_header))
+        header = Header(*read_and_unpack(source, s_header))
+        if header.version != 9:
+            raise ValueError("not a NetFlow Version 9 packet: version {}".format(header.version))
+        return header
 
     def encode(self):
         return s_header.pack(self.version,
@@ -179,7 +216,10 @@ class Header(object):
                              self.source_id)
 
 
+@functools.lru_cache(maxsize=None)
 def create_struct(dtype, length):
+    if dtype is None:
+        dtype = int if length <= 8 else bytes
     if dtype is int:
         if length == 1:
             code = 'B'
@@ -190,7 +230,7 @@ def create_struct(dtype, length):
         elif length == 8:
             code = 'Q'
         else:
-            raise ValueError("invalid integer length: {}".format(length))
+            code = "{}B".format(length)
     elif dtype is bytes:
         code = "{}B".format(length)
     elif dtype is str:
@@ -200,12 +240,42 @@ def create_struct(dtype, length):
     return struct.Struct('!' + code)
 
 
-@attr.s
+def create_dtype(dtype, length):
+    """Create the big-endian NumPy field dtype for a template field.
+
+    Integers of widths other than 1, 2, 4 or 8 bytes are kept as raw bytes;
+    ``jit.fold_fields`` turns those of up to 8 bytes into uint64 values.
+    """
+    if dtype is None:
+        dtype = int if length <= 8 else bytes
+    if dtype is int and length in (1, 2, 4, 8):
+        return np.dtype('>u{}'.format(length))
+    elif dtype in (int, bytes):
+        return np.dtype(('u1', (length,)))
+    elif dtype is str:
+        return np.dtype('S{}'.format(length))
+    raise ValueError("invalid datatype: {}".format(dtype))
+
+
+def is_folded(field):
+    """Whether a field is an odd-width integer decoded from raw bytes."""
+    dtype = field.type.dtype
+    if dtype is None:
+        dtype = int if field.length <= 8 else bytes
+    return dtype is int and field.length < 8 and field.length not in (1, 2, 4)
+
+
+def unfold_integer(values, length):
+    """Convert integer values into (n, length) big-endian uint8 values."""
+    return np.asarray(values, dtype='>u8').view('u1').reshape(-1, 8)[:, 8 - length:]
+
+
+@attr.s(slots=True, frozen=True)
 class TemplateField(object):
     """A definition of an individual column in a template.
 
     Parameters:
-        type : FieldType
+        type : FieldType or UnknownFieldType
         length : int
             Length of the above type, in bytes.
     """
@@ -215,14 +285,12 @@ class TemplateField(object):
 
     @property
     def struct(self):
-        if not hasattr(self, '_struct'):
-            self._struct = create_struct(self.type.dtype, self.length)
-        return self._struct
+        return create_struct(self.type.dtype, self.length)
 
     @staticmethod
     def decode(source):
         type, length = read_and_unpack(source, s_type_length)
-        return TemplateField(FieldType(type), length)
+        return TemplateField(field_type(type), length)
 
     def encode(self):
         return s_type_length.pack(self.type.value, self.length)
@@ -239,12 +307,16 @@ class TemplateRecord(object):
             A collection of fields defined for a template.
     """
 
+    __slots__ = ('id', 'fields', '_dtype', '_row_type')
+
     def __init__(self, id, fields=None):
         self.id = id
-        self.fields = fields if fields else []
+        self.fields = tuple(fields) if fields else ()
+        self._dtype = None
+        self._row_type = None
 
     def __eq__(self, other):
-        return self.id == other.id and sorted(self.fields) == sorted(other.fields)
+        return self.id == other.id and self.fields == other.fields
 
     def __len__(self):
         return s_type_length.size + sum(field.length for field in self.fields)
@@ -252,15 +324,35 @@ class TemplateRecord(object):
     def __iter__(self):
         return iter(self.fields)
 
+    @property
+    def dtype(self):
+        """Structured NumPy dtype of a single encoded data record.
+
+        Field names are the lowercase field type names; repeated field types
+        are suffixed with their position in the template.
+        """
+        if self._dtype is None:
+            names, formats = [], []
+            for i, field in enumerate(self.fields):
+                name = field.type.name.lower()
+                names.append(name if name not in names else '{}_{}'.format(name, i))
+                formats.append(create_dtype(field.type.dtype, field.length))
+            self._dtype = np.dtype({'names': names, 'formats': formats})
+        return self._dtype
+
+    @property
+    def row_type(self):
+        """Named tuple type of a decoded data record, shared by all records."""
+        if self._row_type is None:
+            self._row_type = collections.namedtuple('Record', self.dtype.names, rename=True)
+        return self._row_type
+
     @staticmethod
     def decode(source):
         template_id, nfields = read_and_unpack(source, s_type_length)
 
-        template = TemplateRecord(template_id)
-        for _ in range(nfields):
-            template.fields.append(TemplateField.decode(source))
-
-        return template
+        fields = [TemplateField.decode(source) for _ in range(nfields)]
+        return TemplateRecord(template_id, fields)
 
     def encode(self):
         raw = s_type_length.pack(self.id, len(self.fields))
@@ -277,6 +369,8 @@ class TemplateFlowSet(object):
             A collection of template records.
     """
 
+    __slots__ = ('id', 'templates')
+
     def __init__(self, templates=None):
         self.id = 0
         self.templates = {template.id: template for template in templates} if templates else {}
@@ -287,7 +381,7 @@ class TemplateFlowSet(object):
     def __len__(self):
         nbytes = s_type_length.size
         for template in self.templates.values():
-            nbytes += len(template)
+            nbytes += s_type_length.size * (1 + len(template.fields))
         return nbytes
 
     def __getitem__(self, key):
@@ -299,14 +393,16 @@ class TemplateFlowSet(object):
     @staticmethod
     def decode(source):
         fs = TemplateFlowSet()
-        _, length = read_and_unpack(source, s_type_length)
+        _, length = decode_flowset_header(source)
         offset = s_type_length.size
 
-        while offset < length:
+        while length - offset >= s_type_length.size:
             template = TemplateRecord.decode(source)
             fs.templates[template.id] = template
-            offset += len(template)
+            offset += s_type_length.size * (1 + len(template.fields))
 
+        # Skip padding
+        read_exactly(source, max(length - offset, 0))
         return fs
 
     def encode(self):
@@ -330,51 +426,139 @@ class DataFlowSet(object):
             A dictionary of template records, keyed by given TemplateRecord id.
     """
 
+    __slots__ = ('template', 'record_length', '_array', '_records')
+
     def __init__(self, id, payload, templates):
         self.template = templates[id]
-        self.records = []
         self.record_length = len(self.template) - s_type_length.size
+        self._array = None
+        self._records = []
 
         if isinstance(payload, bytes):
-            source = io.BytesIO(payload)
-            remaining = len(payload)
-            while remaining >= self.record_length:
-                self.records.append([read_and_unpack(source, field.struct)[0] for field in self.template])
-                remaining -= self.record_length
+            count = len(payload) // self.record_length if self.record_length else 0
+            self._array = np.frombuffer(payload, dtype=self.template.dtype, count=count)
+            self._records = None
         elif isinstance(payload, list):
-            self.records = payload
+            self._records = [self.template.row_type._make(record) for record in payload]
 
     def __len__(self):
-        return s_type_length.size + len(self.records) * self.record_length
+        return s_type_length.size + self.count * self.record_length
+
+    @property
+    def count(self):
+        """Number of data records."""
+        return len(self._records) if self._records is not None else len(self._array)
 
     def __iter__(self):
         return iter(self.records)
 
+    @property
+    def array(self):
+        """Data records as a structured array of the template dtype."""
+        if self._array is None:
+            array = np.zeros(len(self._records), dtype=self.template.dtype)
+            for i, (name, field) in enumerate(zip(array.dtype.names, self.template.fields)):
+                values = [record[i] for record in self._records]
+                if is_folded(field):
+                    values = unfold_integer(values, field.length)
+                if len(values):
+                    array[name] = values
+            self._array = array
+        return self._array
+
+    @property
+    def records(self):
+        """Data records as named tuples of the template's ``row_type``."""
+        if self._records is None:
+            columns = self.columns()
+            values = zip(*[col.tolist() for col in columns.values()])
+            self._records = list(map(self.template.row_type._make, values))
+        return self._records
+
+    def columns(self):
+        """Decode data records into native-endian columns keyed by field name.
+
+        Odd-width integer fields are folded together; see ``jit.fold_fields``.
+        """
+        array = self.array
+        names = array.dtype.names
+        folded = [name for name, field in zip(names, self.template.fields) if is_folded(field)]
+        if folded:
+            folded = dict(zip(folded, fold_fields(array, folded)))
+        columns = collections.OrderedDict()
+        for name in names:
+            if name in folded:
+                columns[name] = folded[name]
+            else:
+                column = array[name]
+                columns[name] = column.astype(column.dtype.newbyteorder('='))
+        return columns
+
     @staticmethod
-    def decode(source):
-        id, length = read_and_unpack(source, s_type_length)
-        payload = source.read(length - s_type_length.size)
+    def decode(source, scan=None):
+        id, length = decode_flowset_header(source)
+        if scan:
+            skip(source, length - s_type_length.size)
+            return SkippedFlowSet(id, length)
+        payload = read_exactly(source, length - s_type_length.size)
         return functools.partial(DataFlowSet, id, payload)
 
     def encode(self):
-        raw = s_type_length.pack(self.template.id, len(self))
-        for record in self.records:
-            for field, value in zip(self.template.fields, record):
-                raw += field.struct.pack(value)
-        return raw
+        return s_type_length.pack(self.template.id, len(self)) + self.array.tobytes()
 
 
-def decode_flowset(source):
-    # Peek ahead to find flowset ID
-    loc = source.tell()
-    raw = source.read(s_flowset.size)
-    source.seek(loc)
+@attr.s(slots=True, frozen=True)
+class SkippedFlowSet(object):
+    """A flowset whose payload was skipped instead of decoded.
+
+    Parameters:
+        id : int
+            ID of the flowset; for data flowsets, the ID of the template of
+            the data records.
+        length : int
+            Length of the flowset including its header, in bytes.
+        template : TemplateRecord, optional
+            Template of the data records, once it is known.
+    """
+
+    id = attr.ib(type=int)
+    length = attr.ib(type=int)
+    template = attr.ib(default=None, eq=False)
+
+    @property
+    def count(self):
+        """Number of data records, or 0 if the template is not known."""
+        if self.template is None:
+            return 0
+        record_length = len(self.template) - s_type_length.size
+        return (self.length - s_type_length.size) // record_length if record_length else 0
+
+
+def decode_flowset_header(source):
+    """Read the ID and length of a flowset, checking that the length is valid."""
+    id, length = read_and_unpack(source, s_type_length)
+    if length < s_type_length.size:
+        raise ValueError("invalid flowset length: {}".format(length))
+    return id, length
+
 
+def decode_flowset(source, scan=None):
+    if scan == 'headers':
+        id, length = decode_flowset_header(source)
+        skip(source, length - s_type_length.size)
+        return SkippedFlowSet(id, length)
+
+    # Peek ahead to find flowset ID
+    raw = peek(source, s_flowset.size)
     flowset_id = s_flowset.unpack(raw)[0]
     if flowset_id == 0:
         return TemplateFlowSet.decode(source)
     if flowset_id > 255:
-        return DataFlowSet.decode(source)
+        return DataFlowSet.decode(source, scan)
+
+    # Skip options templates and reserved flowsets
+    _, length = decode_flowset_header(source)
+    read_exactly(source, length - s_type_length.size)
     return None
 
 
@@ -389,6 +573,8 @@ class ExportPacket(object):
             reasonable defaults is created.
     """
 
+    __slots__ = ('header', 'flowsets')
+
     def __init__(self, flowsets, header=None):
         self.header = header if header else Header(count=len(flowsets))
         self.flowsets = flowsets
@@ -408,18 +594,83 @@ class ExportPacket(object):
         cannot assume the needed template is available when we encounter the
         data flowset. Thus, we place the deserialization process on hold until
         a packet is fully read. Then we re-scan the partially-decoded data
-        flowsets and finish deserialization.
+        flowsets and finish deserialization. Data flowsets whose template has
+        not been seen yet, e.g. at the start of a capture, stay undecoded.
+        Skipped data flowsets are given their template instead.
         """
         for i, flowset in enumerate(self.flowsets):
-            if isinstance(flowset, functools.partial):
+            if isinstance(flowset, functools.partial) and flowset.args[0] in templates:
                 self.flowsets[i] = flowset(templates)
+            elif isinstance(flowset, SkippedFlowSet) and flowset.id in templates:
+                self.flowsets[i] = attr.evolve(flowset, template=templates[flowset.id])
+
+    def count(self):
+        """Count data records by source ID and template ID.
+
+        Works on decoded and scanned packets alike; data flowsets whose
+        template is not known are not counted.
+
+        Returns:
+            A Counter keyed by ``(source_id, template_id)``.
+        """
+        counts = collections.Counter()
+        for flowset in self.flowsets:
+            if isinstance(flowset, (DataFlowSet, SkippedFlowSet)) and flowset.count:
+                counts[self.header.source_id, flowset.template.id] += flowset.count
+        return counts
+
+    def validate(self):
+        """Raise ValueError if the packet is implausible.
+
+        Used to tell packets from other bytes when resynchronizing a stream;
+        see ``utils.PacketReader``.
+        """
+        if not self.header.count:
+            raise ValueError("packet without flowsets")
+        for flowset in self.flowsets:
+            if not isinstance(flowset, TemplateFlowSet):
+                continue
+            for template in flowset.templates.values():
+                if template.id < 256 or not template.fields:
+                    raise ValueError("invalid template: {}".format(template.id))
+
+    def iter_columns(self, address=None, timestamps=False):
+        """Iterate over the columns of each data flowset.
+
+        Parameters:
+            address : str, optional
+                Representation of IP address fields; see
+                ``columns.convert_addresses``.
+            timestamps : bool, optional
+                If True, add absolute flow times; see
+                ``columns.add_timestamps``.
+        """
+        for flowset in self.flowsets:
+            if not isinstance(flowset, DataFlowSet):
+                continue
+            columns = convert_addresses(flowset.columns(), address)
+            if timestamps:
+                columns = add_timestamps(columns, self.header.uptime, self.header.datetime)
+            yield columns
+
+    def iter_records(self, address=None, timestamps=False):
+        """Iterate over data records as dicts keyed by lowercase field name.
+
+        Parameters are the same as for ``iter_columns``.
+        """
+        for columns in self.iter_columns(address, timestamps):
+            for record in to_records(columns):
+                yield record
 
     @staticmethod
-    def decode(source):
+    def decode(source, scan=None, select=None):
         header = Header.decode(source)
+        if scan is None and select is not None and not select(header):
+            # Keep the templates of packets that are not selected
+            scan = 'templates'
         flowsets = []
         for _ in range(header.count):
-            flowset = decode_flowset(source)
+            flowset = decode_flowset(source, scan)
             if flowset:
                 flowsets.append(flowset)
         return ExportPacket(flowsets, header=header)
@@ -427,29 +678,57 @@ class ExportPacket(object):
     def encode(self):
         raw = self.header.encode()
         for flowset in self.flowsets:
-            if isinstance(flowset, functools.partial):
+            if isinstance(flowset, (functools.partial, SkippedFlowSet)):
                 continue
             raw += flowset.encode()
         return raw
 
 
-class PacketStream(object):
+class PacketStream(PacketReader):
     """A read-only representation of serialized packets.
 
+    The offset of the end of the last complete packet read is kept in
+    ``offset``, and counts of packets read and skipped in ``stats``.
+
     Parameters:
         source : file-like object
             Read-only input for packets.
+        scan : str, optional
+            If ``'templates'``, only packet headers and template flowsets are
+            decoded; data flowsets are skipped by their length and yielded as
+            ``SkippedFlowSet``. If ``'headers'``, only packet headers and
+            flowset IDs and lengths are decoded, and every flowset is skipped.
+        sampler : callable, optional
+            Called with the header of each packet; the data flowsets of
+            packets for which it returns False are skipped as in the
+            ``'templates'`` scan mode. See ``utils.PacketSampler`` and
+            ``utils.TimeWindow``.
+        follow, poll_interval, timeout, errors : optional
+            Options for files that are still being written, and for packets
+            that cannot be decoded; see ``utils.PacketReader``.
     """
 
-    def __init__(self, source):
-        self._source = source
+    markers = (s_flowset.pack(9),)
+
+    def __init__(self, source, scan=None, sampler=None, follow=False, poll_interval=1.0,
+                 timeout=None, errors='stop'):
+        if scan not in SCAN_MODES:
+            raise ValueError("invalid scan mode: {}".format(scan))
+        super(PacketStream, self).__init__(source, follow, poll_interval, timeout, errors)
+        self._scan = scan
+        self._sampler = sampler
         self._cache = {}
 
+    @property
+    def templates(self):
+        """Template records seen so far, keyed by template ID."""
+        return self._cache
+
+    def decode(self, source):
+        return ExportPacket.decode(source, self._scan, self._sampler)
+
     def next(self):
-        try:
-            packet = ExportPacket.decode(self._source)
-        except:
-            raise StopIteration
+        packet = self.read_packet()
 
         # Add templates to cache
         packet.update_cache(self._cache)
@@ -459,40 +738,40 @@ class PacketStream(object):
 
         return packet
 
-    def __next__(self):
-        return self.next()
+    def count(self):
+        """Count the data records of the remaining packets.
 
-    def __iter__(self):
-        return self
+        Only template flowsets are decoded, whatever the scan mode of the
+        stream, so the count runs at close to the speed the stream is read.
+        The stream is consumed.
 
-    def close(self):
-        return self._source.close()
+        Returns:
+            A Counter keyed by ``(source_id, template_id)``.
+        """
+        scan, self._scan = self._scan, 'templates'
+        try:
+            return sum((packet.count() for packet in self), collections.Counter())
+        finally:
+            self._scan = scan
 
 
-class RecordStream(PacketStream):
+class RecordStream(RecordQueue, PacketStream):
     """A read-only representation of serialized data records.
 
     Parameters:
         source : file-like object
             Read-only input for data records.
+        address, timestamps, sampler : optional
+            Decoding of the records; see ``utils.RecordQueue``.
+        follow, poll_interval, timeout, errors : optional
+            Options for files that are still being written, and for packets
+            that cannot be decoded; see ``utils.PacketReader``.
     """
 
-    def __init__(self, source):
-        super(RecordStream, self).__init__(source)
-        self._queue = []
-
-    def next(self):
-        while len(self._queue) == 0:
-            packet = super(RecordStream, self).next()
-            for flowset in packet.flowsets:
-                if not isinstance(flowset, DataFlowSet):
-                    continue
-                keys = [field.type.name.lower() for field in flowset.template.fields]
-                for record in flowset.records:
-                    self._queue.append(dict(zip(keys, record)))
-
-        return self._queue.pop(0)
-
-    def close(self):
-        self._queue = []
-        return super(RecordStream, self).close()
+    def __init__(self, source, address=None, timestamps=False, sampler=None, follow=False,
+                 poll_interval=1.0, timeout=None, errors='stop'):
+        super(RecordStream, self).__init__(source, sampler=sampler, follow=follow,
+                                           poll_interval=poll_interval, timeout=timeout,
+                                           errors=errors)
+        self._address = address
+        self._timestamps = timestamps
@@ -0,0 +1,261 @@
+"""Writer of Version 9 packets from columns of data records.
+
+Records are taken from a pandas DataFrame, a pyarrow Table or a dict of
+arrays, converted once into a structured array of the template's dtype, and
+encoded a batch of packets at a time: the packets of a batch share a layout,
+so they are laid out as rows of a single byte array, with the packet headers
+filled in through a structured view. Each packet carries one data flowset
+with as many records as fit in an MTU-sized UDP datagram. Template flowsets
+are sent in packets of their own, first and again at an interval, as an
+exporter does for collectors that join late.
+
+Records with an ``export_time`` index or column (as read with the
+``'dataframe'`` container) are written in packets whose export time is theirs;
+other records are given the current time.
+"""
+
+import collections
+import time
+
+import numpy as np
+
+from .frame import INDEX
+from .v9 import Header, TemplateFlowSet, is_folded, s_header, s_type_length, unfold_integer
+
+
+# IPv4 and UDP headers taking up part of the MTU
+DATAGRAM_OVERHEAD = 28
+
+packet_dtype = np.dtype([
+    ('version', '>u2'),
+    ('count', '>u2'),
+    ('uptime', '>u4'),
+    ('datetime', '>u4'),
+    ('sequence', '>u4'),
+    ('source_id', '>u4'),
+    ('flowset_id', '>u2'),
+    ('length', '>u2'),
+])
+
+
+def to_columns(data):
+    """Return the columns of a DataFrame, Arrow table or dict as NumPy arrays.
+
+    The ``export_time`` index of a DataFrame is included as a column.
+    """
+    if hasattr(data, 'column_names'):
+        return collections.OrderedDict(
+            (name, data.column(name).to_numpy()) for name in data.column_names)
+    if hasattr(data, 'columns') and hasattr(data, 'index'):
+        columns = collections.OrderedDict((name, data[name].to_numpy()) for name in data.columns)
+        if data.index.name == INDEX:
+            columns[INDEX] = data.index.to_numpy()
+        return columns
+    return collections.OrderedDict((name, np.asarray(values)) for name, values in data.items())
+
+
+def to_array(columns, template, names=None):
+    """Convert columns into a structured array of a template's dtype.
+
+    Parameters:
+        columns : dict
+            Arrays keyed by column name. Integer fields take integer values,
+            and other fields arrays of ``(n, length)`` bytes or ``bytes``
+            objects of the field length, as decoded by ``DataFlowSet``.
+            String fields take ``bytes`` or ASCII ``str`` values of up to
+            the field length, padded with NULs.
+        template : TemplateRecord
+            Template of the records.
+        names : dict, optional
+            Column names keyed by field name, for columns that are not named
+            after their field.
+    """
+    names = names or {}
+    dtype = template.dtype
+    count = len(next(iter(columns.values()), ()))
+    array = np.zeros(count, dtype=dtype)
+    for name, field in zip(dtype.names, template.fields):
+        column = names.get(name, name)
+        if column not in columns:
+            raise ValueError("missing column for field {}: {}".format(name, column))
+        values = columns[column]
+        if field.type.dtype is str:
+            # Decoded strings have their trailing NULs stripped
+            values = np.array(values, dtype='S{}'.format(field.length))
+        elif values.dtype == object:
+            values = np.frombuffer(b''.join(values), dtype='u1').reshape(count, -1)
+        elif values.dtype.kind == 'S':
+            values = np.ascontiguousarray(values).view('u1').reshape(count, -1)
+        elif is_folded(field):
+            values = unfold_integer(values, field.length)
+        array[name] = values
+    return array
+
+
+class PacketWriter(object):
+    """Buffered writer of Version 9 packets.
+
+    Parameters:
+        sink : file-like object
+            Writable output for packets. It is closed with the writer.
+        templates : TemplateRecord or dict
+            Template of the records to write, or templates keyed by ID.
+        mtu : int, optional
+            Maximum transmission unit of the link packets are sized for;
+            packets fit in a single UDP datagram.
+        template_interval : int, optional
+            Number of data packets after which templates are sent again.
+        source_id : int, optional
+            Source ID of the packets.
+        uptime : int, optional
+            System uptime of the packets in milliseconds, the reference of
+            the switching times of records.
+        buffer_size : int, optional
+            Number of bytes collected before writing to ``sink``.
+    """
+
+    def __init__(self, sink, templates, mtu=1500, template_interval=20, source_id=0, uptime=0,
+                 buffer_size=4 * 2**20):
+        if not isinstance(templates, dict):
+            templates = {templates.id: templates}
+        if template_interval < 1:
+            raise ValueError("invalid template interval: {}".format(template_interval))
+        self._sink = sink
+        self.templates = templates
+        self._max_size = mtu - DATAGRAM_OVERHEAD
+        self._template_interval = template_interval
+        self._source_id = source_id
+        self._uptime = uptime
+        self._buffer_size = buffer_size
+        self._buffer = []
+        self._buffered = 0
+        self._since_templates = None
+        self.sequence = 0
+
+        for template in templates.values():
+            if self.records_per_packet(template) < 1:
+                raise ValueError("template {} does not fit the MTU".format(template.id))
+        if s_header.size + len(TemplateFlowSet(templates.values())) > self._max_size:
+            raise ValueError("templates do not fit the MTU")
+
+    def records_per_packet(self, template):
+        """Maximum number of records of a template in a packet."""
+        record_length = len(template) - s_type_length.size
+        return (self._max_size - packet_dtype.itemsize) // record_length
+
+    def write(self, data, template_id=None, names=None):
+        """Write records as packets.
+
+        Parameters:
+            data : pandas.DataFrame, pyarrow.Table or dict
+                Records to write, with a column per template field; see
+                ``to_array``. An ``export_time`` index or column sets the
+                export time of the packets.
+            template_id : int, optional
+                ID of the template of the records; required if the writer has
+                more than one template.
+            names : dict, optional
+                Column names keyed by field name; see ``to_array``.
+        """
+        if template_id is None:
+            if len(self.templates) > 1:
+                raise ValueError("template_id is required with several templates")
+            template_id = next(iter(self.templates))
+        template = self.templates[template_id]
+        columns = to_columns(data)
+        array = to_array(columns, template, names)
+        if not len(array):
+            return
+
+        if INDEX in columns:
+            times = np.asarray(columns[INDEX]).astype('datetime64[s]').astype('i8')
+        else:
+            times = np.full(len(array), int(time.time()), dtype='i8')
+        # Records of a packet share its export time
+        bounds = [0] + (np.flatnonzero(np.diff(times)) + 1).tolist() + [len(array)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            self._write_records(template, array[start:end], times[start])
+
+    def _write_records(self, template, array, datetime):
+        """Write records exported at the same time."""
+        per_packet = self.records_per_packet(template)
+        pos = 0
+        while pos < len(array):
+            if self._since_templates is None or self._since_templates >= self._template_interval:
+                self._write_templates(datetime)
+            npackets = self._template_interval - self._since_templates
+            full = min(npackets, (len(array) - pos) // per_packet)
+            if full:
+                size = full * per_packet
+            else:
+                full, size = 1, len(array) - pos
+            self._write_packets(template, array[pos:pos + size], full, datetime)
+            self._since_templates += full
+            pos += size
+
+    def _write_packets(self, template, array, npackets, datetime):
+        """Encode records into packets of equal size and buffer them."""
+        count = len(array) // npackets
+        record_length = template.dtype.itemsize
+        out = np.empty((npackets, packet_dtype.itemsize + count * record_length), dtype='u1')
+        headers = out[:, :packet_dtype.itemsize].view(packet_dtype)[:, 0]
+        headers['version'] = 9
+        headers['count'] = 1
+        headers['uptime'] = self._uptime
+        headers['datetime'] = datetime
+        headers['sequence'] = self.sequence + np.arange(npackets)
+        headers['source_id'] = self._source_id
+        headers['flowset_id'] = template.id
+        headers['length'] = s_type_length.size + count * record_length
+        out[:, packet_dtype.itemsize:] = np.ascontiguousarray(array).view('u1').reshape(npackets, -1)
+        self.sequence += npackets
+        self._append(out.tobytes())
+
+    def _write_templates(self, datetime):
+        header = Header(count=1, uptime=self._uptime, datetime=int(datetime),
+                        sequence=self.sequence, source_id=self._source_id)
+        self._append(header.encode() + TemplateFlowSet(self.templates.values()).encode())
+        self.sequence += 1
+        self._since_templates = 0
+
+    def _append(self, raw):
+        self._buffer.append(raw)
+        self._buffered += len(raw)
+        if self._buffered >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered packets to the sink."""
+        if self._buffer:
+            self._sink.write(b''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def close(self):
+        self.flush()
+        return self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_packets(path, data, templates, **kwargs):
+    """Write records to a local file of Version 9 packets.
+
+    Parameters:
+        path : str
+            Location of the file, which is overwritten.
+        data : pandas.DataFrame, pyarrow.Table or dict
+            Records to write; see ``PacketWriter.write``.
+        templates : TemplateRecord or dict
+            Template of the records; see ``PacketWriter``.
+        kwargs : optional
+            Further options of ``PacketWriter``, and ``template_id`` and
+            ``names`` of ``PacketWriter.write``.
+    """
+    write_kwargs = {key: kwargs.pop(key) for key in ('template_id', 'names') if key in kwargs}
+    with PacketWriter(open(path, 'wb'), templates, **kwargs) as writer:
+        writer.write(data, **write_kwargs)
@@ -16,3 +16,8 @@ def ipv4_template():
         nf.TemplateField(nf.FieldType.OUT_BYTES, 4),
         nf.TemplateField(nf.FieldType.OUT_PKTS, 4)]
     return nf.TemplateRecord(1024, fields)
+
+
+@pytest.fixture
+def v5_flows():
+    return [[3232235781, 3232235782, 0, 1, 2, 16, 1024, 1000, 2000, 21, 5000, 24, 6, 0, 0, 0, 24, 24]]
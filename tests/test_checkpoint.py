@@ -0,0 +1,148 @@
+import json
+import os
+
+import pytest
+
+import intake_netflow.v9 as nf
+from intake_netflow.checkpoint import Checkpoint, decode_templates, encode_templates
+from intake_netflow.source import NetflowSource
+
+
+@pytest.fixture
+def packets(ipv4_template):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, [[17, 1, 21, 2, 5000, 1024, 16, 512, 8]], tfs.templates)
+    return nf.ExportPacket([tfs, data]).encode(), nf.ExportPacket([data]).encode()
+
+
+def read(path, checkpoint):
+    src = NetflowSource(urlpath=path, checkpoint=checkpoint)
+    data = src.read()
+    src.close()
+    return data
+
+
+def test_templates_roundtrip(ipv4_template):
+    templates = {ipv4_template.id: ipv4_template}
+
+    assert decode_templates(encode_templates(templates)) == templates
+    assert decode_templates(encode_templates({})) == {}
+
+
+def test_incremental_reads(tmpdir, packets):
+    first, second = packets
+    path = str(tmpdir.join('current.netflow'))
+    checkpoint = str(tmpdir.join('checkpoint.json'))
+    with open(path, 'wb') as f:
+        f.write(first + second[:5])
+
+    assert len(read(path, checkpoint)) == 1
+    entry = list(Checkpoint(checkpoint).files.values())[0]
+    assert entry['offset'] == len(first)
+
+    # Unchanged files are skipped
+    assert read(path, checkpoint) == []
+
+    # Appended packets are decoded with the saved templates
+    with open(path, 'ab') as f:
+        f.write(second[5:] + second)
+    assert len(read(path, checkpoint)) == 2
+
+    # Replaced files are read from the start
+    with open(path, 'wb') as f:
+        f.write(first)
+    assert len(read(path, checkpoint)) == 1
+
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_sampled_incremental_reads(tmpdir, ipv4_template, chunked):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, [[17, 1, 21, 2, 5000, 1024, 16, 512, 8]] * 30,
+                          tfs.templates)
+    first = nf.ExportPacket([tfs, data], header=nf.Header(count=2)).encode()
+    second = nf.ExportPacket([data]).encode()
+    path = str(tmpdir.join('current.netflow'))
+    checkpoint = str(tmpdir.join('checkpoint.json'))
+    with open(path, 'wb') as f:
+        f.write(first + second[:len(second) // 2])
+
+    def sampled():
+        src = NetflowSource(urlpath=path, checkpoint=checkpoint, every_nth=2)
+        if chunked:
+            data = [record for chunk in src.read_chunked(chunksize=7) for record in chunk]
+        else:
+            data = src.read()
+        src.close()
+        return data
+
+    # The skipped half packet is not taken as read
+    assert len(sampled()) == 30
+    assert list(Checkpoint(checkpoint).files.values())[0]['offset'] == len(first)
+
+    with open(path, 'ab') as f:
+        f.write(second[len(second) // 2:] + second)
+    assert len(sampled()) == 30
+    assert list(Checkpoint(checkpoint).files.values())[0]['offset'] == len(first + second * 2)
+
+
+def test_replaced_by_larger_file(tmpdir, ipv4_template):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, [[17, 1, 21, 2, 5000, 1024, 16, 512, 8]] * 3,
+                          tfs.templates)
+    path = str(tmpdir.join('current.netflow'))
+    checkpoint = str(tmpdir.join('checkpoint.json'))
+    with open(path, 'wb') as f:
+        f.write(nf.ExportPacket([tfs, data], header=nf.Header(count=2, datetime=1000)).encode())
+    assert len(read(path, checkpoint)) == 3
+
+    # Rotated: replaced atomically by a larger file of other packets
+    tmp = str(tmpdir.join('current.tmp'))
+    with open(tmp, 'wb') as f:
+        header = nf.Header(count=2, sequence=0, datetime=2000)
+        f.write(nf.ExportPacket([tfs, data], header=header).encode())
+        for sequence in range(1, 7):
+            header = nf.Header(count=1, sequence=sequence, datetime=2000)
+            f.write(nf.ExportPacket([data], header=header).encode())
+    os.replace(tmp, path)
+    assert len(read(path, checkpoint)) == 21
+    assert read(path, checkpoint) == []
+
+
+def test_invalid_checkpoint(tmpdir):
+    checkpoint = str(tmpdir.join('checkpoint.json'))
+    with open(checkpoint, 'w') as f:
+        json.dump(dict(version=0, files={}), f)
+
+    with pytest.raises(ValueError):
+        Checkpoint(checkpoint)
+    with pytest.raises(ValueError):
+        NetflowSource(urlpath='*.pcap', format='pcap', checkpoint=checkpoint)
+
+
+def test_chunked_reads(tmpdir, packets):
+    first, second = packets
+    path = str(tmpdir.join('current.netflow'))
+    checkpoint = str(tmpdir.join('checkpoint.json'))
+    with open(path, 'wb') as f:
+        f.write(first + second)
+
+    src = NetflowSource(urlpath=path, checkpoint=checkpoint)
+    assert [len(chunk) for chunk in src.read_chunked(chunksize=1)] == [1, 1]
+    src.close()
+
+    assert read(path, checkpoint) == []
+
+
+def test_count_from_checkpoint(tmpdir, packets):
+    first, second = packets
+    path = str(tmpdir.join('current.netflow'))
+    checkpoint = str(tmpdir.join('checkpoint.json'))
+    with open(path, 'wb') as f:
+        f.write(first + second)
+    assert len(read(path, checkpoint)) == 2
+
+    with open(path, 'ab') as f:
+        f.write(second * 3)
+    src = NetflowSource(urlpath=path, checkpoint=checkpoint)
+    assert sum(src.count().values()) == 3
+    assert len(src.read()) == 3
@@ -0,0 +1,91 @@
+import collections
+import datetime
+
+import numpy as np
+import pytest
+
+from intake_netflow.columns import add_timestamps, convert_addresses, to_records
+
+
+@pytest.fixture
+def columns():
+    ipv6 = np.zeros((2, 16), dtype='u1')
+    ipv6[0, :4] = [0x20, 0x01, 0x0d, 0xb8]
+    ipv6[0, 15] = 1
+    ipv6[1, 15] = 1
+    return collections.OrderedDict([
+        ('protocol', np.array([6, 17], dtype='u1')),
+        ('ipv4_src_addr', np.array([3232235781, 167772160], dtype='u4')),
+        ('ipv6_dst_addr', ipv6),
+    ])
+
+
+def test_default_mode(columns):
+    assert convert_addresses(columns) is columns
+
+
+def test_uint32_mode(columns):
+    given = convert_addresses(columns, 'uint32')
+
+    assert given['ipv4_src_addr'].dtype == np.uint32
+    assert given['ipv6_dst_addr'].dtype == np.dtype('V16')
+    assert given['ipv6_dst_addr'].tolist()[1] == b'\x00' * 15 + b'\x01'
+
+
+def test_bytes16_mode(columns):
+    given = convert_addresses(columns, 'bytes16')
+
+    assert given['ipv4_src_addr'].tolist()[0] == b'\x00' * 10 + b'\xff\xff\xc0\xa8\x01\x05'
+    assert given['ipv4_src_addr'].tolist()[1] == b'\x00' * 10 + b'\xff\xff\x0a\x00\x00\x00'
+
+
+def test_uint64_mode(columns):
+    given = convert_addresses(columns, 'uint64')
+
+    assert list(given) == ['protocol', 'ipv4_src_addr_hi', 'ipv4_src_addr_lo',
+                           'ipv6_dst_addr_hi', 'ipv6_dst_addr_lo']
+    assert given['ipv4_src_addr_hi'].tolist() == [0, 0]
+    assert given['ipv4_src_addr_lo'].tolist() == [0xffffc0a80105, 0xffff0a000000]
+    assert given['ipv6_dst_addr_hi'].tolist() == [0x20010db800000000, 0]
+    assert given['ipv6_dst_addr_lo'].tolist() == [1, 1]
+
+
+def test_str_mode(columns):
+    given = convert_addresses(columns, 'str')
+
+    assert given['ipv4_src_addr'].tolist() == ['192.168.1.5', '10.0.0.0']
+    assert given['ipv6_dst_addr'].tolist() == ['2001:db8::1', '::1']
+
+
+def test_invalid_mode(columns):
+    with pytest.raises(ValueError):
+        convert_addresses(columns, 'hex')
+
+
+def test_to_records(columns):
+    records = to_records(convert_addresses(columns, 'str'))
+
+    assert records == [
+        {'protocol': 6, 'ipv4_src_addr': '192.168.1.5', 'ipv6_dst_addr': '2001:db8::1'},
+        {'protocol': 17, 'ipv4_src_addr': '10.0.0.0', 'ipv6_dst_addr': '::1'}]
+
+
+def test_add_timestamps():
+    columns = collections.OrderedDict([
+        ('first_switched', np.array([1000, 4294967000], dtype='u4')),
+        ('last_switched', np.array([3000, 200], dtype='u4')),
+    ])
+
+    given = add_timestamps(columns, uptime=5000, datetime=1523000000, milliseconds=250)
+
+    assert given['flow_start'].dtype == np.dtype('datetime64[ms]')
+    assert given['flow_start'].tolist()[0] == datetime.datetime(2018, 4, 6, 7, 33, 16, 250000)
+    assert given['flow_end'].tolist()[0] == datetime.datetime(2018, 4, 6, 7, 33, 18, 250000)
+    assert given['flow_duration'].astype('i8').tolist() == [2000, 496]
+    assert 'flow_start' not in columns
+
+
+def test_add_timestamps_without_switched():
+    columns = {'protocol': np.array([6], dtype='u1')}
+
+    assert add_timestamps(columns, uptime=0, datetime=0) is columns
@@ -1,4 +1,5 @@
 import io
+import struct
 
 import pytest
 
@@ -21,3 +22,63 @@ def test_flowset_nonempty_roundtrip(ipv4_template, ipv4_flows):
     given = given(templates)
 
     assert expected.records == given.records
+
+
+def test_flowset_ipv6_columns():
+    template = nf.TemplateRecord(1025, [
+        nf.TemplateField(nf.FieldType.IPV6_SRC_ADDR, 16),
+        nf.TemplateField(nf.FieldType.L4_SRC_PORT, 2)])
+    templates = {template.id: template}
+    address = list(range(16))
+    expected = nf.DataFlowSet(template.id, [[address, 80], [address, 443]], templates)
+
+    given = nf.DataFlowSet.decode(io.BytesIO(expected.encode()))
+    given = given(templates)
+
+    assert given.records == [(address, 80), (address, 443)]
+
+    columns = given.columns()
+    assert columns['ipv6_src_addr'].shape == (2, 16)
+    assert columns['l4_src_port'].tolist() == [80, 443]
+
+
+def test_flowset_odd_widths():
+    template = nf.TemplateRecord(1026, [
+        nf.TemplateField(nf.FieldType.MPLS_TOP_LABEL_TYPE, 3),
+        nf.TemplateField(nf.field_type(87), 6),
+        nf.TemplateField(nf.field_type(40000), 16),
+        nf.TemplateField(nf.FieldType.IN_BYTES, 4)])
+    templates = {template.id: template}
+    raw = list(range(16))
+    expected = nf.DataFlowSet(template.id, [[0x123456, 2**40 + 1, raw, 10]], templates)
+
+    given = nf.DataFlowSet.decode(io.BytesIO(expected.encode()))
+    given = given(templates)
+
+    assert given.records == [(0x123456, 2**40 + 1, raw, 10)]
+    columns = given.columns()
+    assert list(columns) == ['mpls_top_label_type', 'field_87', 'field_40000', 'in_bytes']
+    assert columns['field_87'].dtype == 'u8'
+
+
+def test_options_flowset_skipped(ipv4_template):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, [[17, 1, 2, 3, 4, 5, 6, 7, 8]], tfs.templates)
+    options = struct.pack("!HH", 1, 12) + b'\x00' * 8
+    raw = nf.Header(count=3).encode() + tfs.encode() + options + data.encode()
+
+    packet = nf.PacketStream(io.BytesIO(raw)).next()
+
+    assert len(packet.flowsets) == 2
+    assert packet.flowsets[1].records == [(17, 1, 2, 3, 4, 5, 6, 7, 8)]
+
+
+def test_records_share_row_type(ipv4_template, ipv4_flows):
+    templates = {ipv4_template.id: ipv4_template}
+    fs = nf.DataFlowSet.decode(io.BytesIO(nf.DataFlowSet(ipv4_template.id, ipv4_flows, templates).encode()))
+    fs = fs(templates)
+
+    assert all(type(record) is ipv4_template.row_type for record in fs.records)
+    assert fs.records[0].l4_src_port == 21
+    assert not hasattr(fs, '__dict__')
+    assert not hasattr(ipv4_template.fields[0], '__dict__')
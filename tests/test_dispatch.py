@@ -0,0 +1,114 @@
+import io
+import struct
+
+import pytest
+
+import intake_netflow.dispatch as nfd
+import intake_netflow.v5 as nf5
+import intake_netflow.v9 as nf
+from intake_netflow.columns import union_dtypes
+
+
+@pytest.fixture
+def v9_flows():
+    return [[17, 3232235781, 21, 3232235782, 5000, 1024, 16, 512, 8]]
+
+
+@pytest.fixture
+def ipfix_packet():
+    payload = b'\x00' * 20
+    return struct.pack("!HHIII", 10, 16 + len(payload), 0, 0, 0) + payload
+
+
+@pytest.fixture
+def mixed(ipv4_template, v5_flows, v9_flows, ipfix_packet):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    raw = nf.ExportPacket([tfs]).encode()
+    raw += nf5.ExportPacket(v5_flows).encode()
+    raw += ipfix_packet
+    raw += nf.ExportPacket([nf.DataFlowSet(ipv4_template.id, v9_flows, tfs.templates)]).encode()
+    raw += nf5.ExportPacket(v5_flows).encode()
+    return raw
+
+
+def test_packet_dispatch(mixed):
+    s = nfd.PacketStream(io.BytesIO(mixed))
+    packets = list(s)
+
+    assert [p.header.version for p in packets] == [9, 5, 9, 5]
+    assert s.skipped[10] == 1
+    assert len(packets[2].flowsets[0].records) == 1
+
+
+def test_record_dispatch(mixed):
+    records = list(nfd.RecordStream(io.BytesIO(mixed)))
+
+    assert len(records) == 3
+    assert records[0]['l4_src_port'] == 21
+    assert records[1]['protocol'] == 17
+    assert records[1]['ipv4_src_addr'] == records[0]['ipv4_src_addr']
+
+
+def test_unknown_version_stops():
+    raw = struct.pack("!HH", 7, 0) + b'\x00' * 32
+
+    assert list(nfd.PacketStream(io.BytesIO(raw))) == []
+
+
+def test_template_scan(mixed, ipv4_template):
+    packets = list(nfd.PacketStream(io.BytesIO(mixed), scan='templates'))
+
+    assert [p.header.version for p in packets] == [9, 5, 9, 5]
+    assert len(packets[1].records) == 0
+    skipped = packets[2].flowsets[0]
+    assert isinstance(skipped, nf.SkippedFlowSet)
+    assert skipped.template == ipv4_template
+    assert skipped.count == 1
+
+
+def test_scan_schema(mixed):
+    schemas, count, bounds = nfd.scan_schema(io.BytesIO(mixed), address='str', timestamps=True)
+    dtypes = union_dtypes(schemas)
+
+    assert count == 3
+    assert dtypes['protocol'] == 'u1'
+    assert dtypes['ipv4_src_addr'].kind == 'U'
+    assert dtypes['flow_start'] == 'datetime64[ms]'
+    assert list(dtypes)[:2] == ['ipv4_src_addr', 'ipv4_dst_addr']
+    assert len(schemas) == 2
+    assert bounds[0] <= bounds[1]
+
+
+def test_invalid_scan_mode():
+    with pytest.raises(ValueError):
+        nfd.PacketStream(io.BytesIO(b''), scan='records')
+
+
+def test_count(mixed, ipv4_template):
+    counts = nfd.PacketStream(io.BytesIO(mixed)).count()
+
+    assert counts == {(0, ipv4_template.id): 1, (0, None): 2}
+
+
+def test_resync(mixed):
+    raw = b'\x01\x02\x03' + mixed[:60] + b'\xff' * 7 + mixed
+
+    s = nfd.PacketStream(io.BytesIO(raw), errors='resync')
+    packets = list(s)
+
+    assert [p.header.version for p in packets][-4:] == [9, 5, 9, 5]
+    assert len(packets[-2].flowsets[0].records) == 1
+    assert s.stats['resyncs'] >= 1
+    assert s.offset == len(raw)
+
+
+@pytest.mark.parametrize('errors', ['stop', 'raise', 'resync'])
+def test_trailing_ipfix_packet(mixed, ipfix_packet, errors):
+    raw = mixed + ipfix_packet
+    s = nfd.PacketStream(io.BytesIO(raw), errors=errors)
+    packets = list(s)
+
+    assert len(packets) == 4
+    assert s.skipped[10] == 2
+    assert s.stats['errors'] == 0
+    assert s.offset == len(raw)
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import intake_netflow.v5 as nf5
+import intake_netflow.v9 as nf
+from intake_netflow.frame import (INDEX, concat_frames, divisions, iter_frames, layout_frames,
+                                  merge_tables, meta_frame, packets_to_frame, packets_to_tables)
+
+
+@pytest.fixture
+def packets(ipv4_template, v5_flows):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    record = [17, 3232235781, 21, 3232235782, 5000, 1024, 16, 512, 8]
+    data = nf.DataFlowSet(ipv4_template.id, [record, record], tfs.templates)
+    return [
+        nf.ExportPacket([tfs, data], header=nf.Header(count=2, datetime=2000)),
+        nf5.ExportPacket(v5_flows, header=nf5.Header(count=1, datetime=1000, nanoseconds=5000000)),
+    ]
+
+
+def test_packets_to_frame(packets):
+    frame = packets_to_frame(packets, address='str')
+
+    assert len(frame) == 3
+    assert frame.index.name == INDEX
+    assert frame.index[0] == pd.Timestamp(1000005, unit='ms')
+    assert frame.index.is_monotonic_increasing
+    assert frame['ipv4_src_addr'].iloc[-1] == '192.168.1.5'
+    assert frame['protocol'].dtype == 'u1'
+    assert np.isnan(frame['out_bytes'].iloc[0])
+
+
+def test_packets_to_frame_meta(packets):
+    dtypes = {'protocol': np.dtype('u1'), 'ipv6_src_addr': np.dtype(('u1', (16,))),
+              'out_bytes': np.dtype('u4')}
+    meta = meta_frame(dtypes, nullable=['out_bytes'])
+
+    frame = packets_to_frame(packets, meta=meta)
+
+    assert list(frame.columns) == ['protocol', 'ipv6_src_addr', 'out_bytes']
+    assert (frame.dtypes == meta.dtypes).all()
+    assert packets_to_frame([], meta=meta).dtypes.equals(meta.dtypes)
+
+
+def test_iter_frames(packets):
+    frames = list(iter_frames(packets * 3, chunksize=2))
+
+    assert [len(frame) for frame in frames] == [2, 2, 2, 2, 1]
+    assert len(pd.concat(frames)) == 9
+    assert len(list(iter_frames(packets, chunksize=None))) == 1
+    assert list(iter_frames([], chunksize=2)) == []
+
+
+def test_packets_to_tables(packets):
+    tables = packets_to_tables(packets)
+
+    assert len(tables) == 2
+    v9_table, v5_table = tables.values()
+    assert len(v9_table) == 2 and len(v5_table) == 1
+    assert list(v9_table.columns) == list(next(iter(tables)))
+    assert v9_table['out_bytes'].dtype == 'u4'
+
+    merged = merge_tables(tables)
+    assert len(merged) == 3
+    assert merged.index.is_monotonic_increasing
+    assert merged['out_bytes'].dtype == 'UInt32'
+    assert merged['out_bytes'].isna().tolist() == [True, False, False]
+    assert merged['protocol'].dtype == 'u1'
+
+
+def test_categorical(packets):
+    v9_packet, v5_packet = packets
+    dtypes = {'protocol': np.dtype('u1'), 'l4_src_port': np.dtype('u2')}
+    meta = meta_frame(dtypes, categorical=['protocol'])
+
+    frames = [packets_to_frame([packet], meta=meta) for packet in packets]
+    assert all(frame['protocol'].dtype == 'category' for frame in frames)
+    frame = concat_frames(frames)
+    assert frame['protocol'].dtype == 'category'
+    assert frame['protocol'].tolist() == [17, 17, 6]
+    assert frame['l4_src_port'].dtype == 'u2'
+
+    tables = packets_to_tables(packets)
+    metas = dict((signature, meta_frame(table.dtypes, categorical=['protocol']))
+                 for signature, table in tables.items())
+    merged = merge_tables(packets_to_tables(packets, metas=metas))
+    assert merged['protocol'].dtype == 'category'
+    assert sorted(merged['protocol'].cat.categories) == [6, 17]
+
+
+def test_categorical_columns(packets):
+    dtypes = {'protocol': np.dtype('u1'), 'ipv4_src_addr': np.dtype(('u1', (16,))),
+              'out_bytes': np.dtype('u4')}
+    meta = meta_frame(dtypes, nullable=['out_bytes'], categorical=list(dtypes))
+
+    frame = packets_to_frame(packets, address='bytes16', meta=meta)
+    assert (frame.dtypes == 'category').all()
+    assert frame['ipv4_src_addr'].cat.categories.tolist() == [
+        bytes(10) + b'\xff\xff' + bytes([192, 168, 1, 5])]
+    assert frame['protocol'].tolist() == [6, 17, 17]
+    assert frame['out_bytes'].isna().tolist() == [True, False, False]
+
+    layout, = layout_frames(packets[:1], address='bytes16', categorical=['ipv4_src_addr']).values()
+    assert layout['ipv4_src_addr'].cat.codes.tolist() == [0, 0]
+
+
+def test_divisions():
+    assert divisions([(0, 999), (1000, 1500)]) == [pd.Timestamp(t, unit='ms') for t in (0, 1000, 1500)]
+    assert divisions([(0, 1000), (1000, 1500)]) is None
+    assert divisions([(0, 999), None]) is None
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="module __getattr__ requires Python 3.7")
+@pytest.mark.parametrize('module', [
+    'intake_netflow',
+    'intake_netflow.v5',
+    'intake_netflow.v9',
+    'intake_netflow.dispatch',
+    'intake_netflow.pcap',
+    'intake_netflow.nfcapd',
+])
+def test_codec_imports_are_light(module):
+    script = "import sys, {}; print(sorted(m for m in ('intake', 'dask') if m in sys.modules))"
+    out = subprocess.check_output([sys.executable, '-c', script.format(module)], cwd=basedir)
+
+    assert out.decode().strip() == '[]'
+
+
+def test_lazy_source():
+    import intake_netflow
+    from intake_netflow.source import NetflowSource
+
+    assert intake_netflow.NetflowSource is NetflowSource
+    assert isinstance(intake_netflow.__version__, str)
+
+
+def test_version_is_plain_attribute():
+    import intake_netflow
+
+    # Set at import time rather than through module __getattr__
+    assert isinstance(vars(intake_netflow)['__version__'], str)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from intake_netflow import jit
+
+
+@pytest.fixture
+def records():
+    dtype = np.dtype({'names': ['top_label', 'port', 'vendor'],
+                      'formats': [('u1', (3,)), '>u2', ('u1', (6,))]})
+    array = np.zeros(3, dtype=dtype)
+    array['top_label'] = [[0x12, 0x34, 0x56], [0, 0, 1], [0xff, 0xff, 0xff]]
+    array['port'] = [21, 80, 443]
+    array['vendor'] = [[0, 0x1b, 0x21, 0x3a, 0x4b, 0x5c], [0] * 6, [0xff] * 6]
+    return array
+
+
+def test_fold_fields(records):
+    values = jit.fold_fields(records, ['top_label', 'vendor'])
+
+    assert values.dtype == 'u8'
+    assert values[0].tolist() == [0x123456, 1, 0xffffff]
+    assert values[1].tolist() == [0x1b213a4b5c, 0, 2**48 - 1]
+    assert jit.fold_fields(records[:0], ['top_label']).shape == (1, 0)
+
+
+def test_kernel_matches_numpy(records, monkeypatch):
+    names = ['vendor', 'top_label']
+    offsets = np.array([records.dtype.fields[name][1] for name in names], dtype=np.intp)
+    widths = np.array([6, 3], dtype=np.intp)
+    out = np.empty((2, len(records)), dtype='u8')
+
+    # The uncompiled kernel, as Numba would run it
+    jit._fold(records.view('u1'), len(records), records.dtype.itemsize, offsets, widths, out)
+
+    monkeypatch.setattr(jit, '_kernel', False)
+    assert out.tolist() == jit.fold_fields(records, names).tolist()
+
+
+def test_compiled_kernel(records):
+    pytest.importorskip('numba')
+    assert jit.kernel() is not None
+
+    # Data flowsets are decoded from read-only views of the packet bytes
+    readonly = np.frombuffer(records.tobytes(), dtype=records.dtype)
+    assert not readonly.flags.writeable
+    values = jit.fold_fields(readonly, ['top_label', 'vendor'])
+
+    assert values[0].tolist() == [0x123456, 1, 0xffffff]
+    assert values[1].tolist() == [0x1b213a4b5c, 0, 2**48 - 1]
@@ -0,0 +1,87 @@
+import bz2
+import io
+import struct
+
+import pytest
+
+import intake_netflow.nfcapd as nfc
+
+
+def flow_record(first, last, ipv6=False, proto=6, sport=1234, dport=80):
+    flags = nfc.FLAG_IPV6_ADDR if ipv6 else 0
+    body = struct.pack("<HHIIBBBBHHHBB", 0, 0, first, last, 0, 0x12, proto, 0,
+                       sport, dport, 1, 0, 0)
+    if ipv6:
+        body += struct.pack("<QQQQ", 0x20010db800000000, 1, 0, 1)
+    else:
+        body += struct.pack("<II", 0xc0a80105, 0xc0a80106)
+    body += struct.pack("<II", 10, 1000)
+    body += b'\x00' * 8  # an extension that is skipped
+    return struct.pack("<HHHH", nfc.COMMON_RECORD_TYPE, 8 + len(body), flags, 0) + body
+
+
+def nfcapd_file(blocks, flags=0, compress=lambda raw: raw):
+    raw = struct.pack("<HHII", nfc.MAGIC, 1, flags, len(blocks)) + b'test'.ljust(128, b'\x00')
+    raw += b'\x00' * nfc.STAT_RECORD_SIZE
+    for records in blocks:
+        payload = compress(b''.join(records))
+        raw += struct.pack("<IIHH", len(records), len(payload), 2, 0) + payload
+    return raw
+
+
+@pytest.fixture
+def blocks():
+    return [
+        [flow_record(1523000000, 1523000001), flow_record(1523000002, 1523000003, ipv6=True)],
+        [flow_record(1523000004, 1523000005, proto=17, dport=53)],
+    ]
+
+
+def test_header():
+    header = nfc.FileHeader.decode(io.BytesIO(nfcapd_file([])))
+
+    assert header.byteorder == '<'
+    assert header.blocks == 0
+    assert header.ident == b'test'
+
+
+def test_not_nfcapd():
+    with pytest.raises(ValueError):
+        nfc.FileHeader.decode(io.BytesIO(b'\x00' * 200))
+
+
+def test_blocks(blocks):
+    s = nfc.BlockStream(io.BytesIO(nfcapd_file(blocks)))
+    decoded = list(s)
+
+    assert len(decoded) == 2
+    assert [len(columns['protocol']) for columns in decoded[0]] == [1, 1]
+    assert decoded[0][0]['ipv4_src_addr'].tolist() == [0xc0a80105]
+    assert decoded[0][1]['ipv6_src_addr'][0, :4].tolist() == [0x20, 0x01, 0x0d, 0xb8]
+
+
+@pytest.mark.parametrize('flags, compress', [
+    (0, lambda raw: raw),
+    (nfc.FLAG_BZ2_COMPRESSED, bz2.compress),
+])
+def test_records(blocks, flags, compress):
+    raw = nfcapd_file(blocks, flags, compress)
+    records = list(nfc.RecordStream(io.BytesIO(raw), address='str', timestamps=True))
+
+    assert len(records) == 3
+    assert records[0]['ipv4_src_addr'] == '192.168.1.5'
+    assert records[0]['l4_dst_port'] == 80
+    assert records[0]['in_bytes'] == 1000
+    assert records[0]['flow_duration'].total_seconds() == 1
+    assert records[1]['ipv6_src_addr'] == '2001:db8::1'
+    assert records[2]['protocol'] == 17
+
+
+def test_single_block(blocks):
+    raw = nfcapd_file(blocks)
+    offsets = [block[0] for block in nfc.iter_blocks(io.BytesIO(raw), nfc.FileHeader.decode(io.BytesIO(raw)))]
+
+    records = list(nfc.RecordStream(io.BytesIO(raw), offset=offsets[1]))
+
+    assert len(records) == 1
+    assert records[0]['l4_dst_port'] == 53
@@ -0,0 +1,116 @@
+import io
+import struct
+
+import pytest
+
+import intake_netflow.pcap as nfp
+import intake_netflow.v9 as nf
+
+
+def udp_frame(src, payload, dport=2055, vlan=False):
+    udp = struct.pack("!HHHH", 50000, dport, 8 + len(payload), 0) + payload
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(udp), 0, 0, 64, 17, 0,
+                     bytes(bytearray(src)), b'\x0a\x00\x00\x01') + udp
+    eth = b'\x00' * 12
+    if vlan:
+        eth += struct.pack("!HH", 0x8100, 10)
+    return eth + struct.pack("!H", 0x0800) + ip
+
+
+def pcap(frames):
+    raw = struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1)
+    for frame in frames:
+        raw += struct.pack("<IIII", 0, 0, len(frame), len(frame)) + frame
+    return raw
+
+
+def pcapng(frames):
+    def block(block_type, body):
+        body += b'\x00' * (-len(body) % 4)
+        return struct.pack("<II", block_type, len(body) + 12) + body + struct.pack("<I", len(body) + 12)
+
+    raw = block(0x0a0d0d0a, struct.pack("<IHHq", 0x1a2b3c4d, 1, 0, -1))
+    raw += block(1, struct.pack("<HHI", 1, 0, 65535))
+    for frame in frames:
+        raw += block(6, struct.pack("<IIIII", 0, 0, 0, len(frame), len(frame)) + frame)
+    return raw
+
+
+@pytest.fixture
+def frames(ipv4_template):
+    flows = [[17, 3232235781, 21, 3232235782, 5000, 1024, 16, 512, 8]]
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, flows, tfs.templates)
+
+    # A second exporter reuses the template ID for a different layout.
+    other = nf.TemplateRecord(ipv4_template.id, [nf.TemplateField(nf.FieldType.PROTOCOL, 1)])
+    other_tfs = nf.TemplateFlowSet([other])
+    other_data = nf.DataFlowSet(other.id, [[6], [17]], other_tfs.templates)
+
+    return [
+        udp_frame([10, 0, 0, 2], nf.ExportPacket([tfs]).encode()),
+        udp_frame([10, 0, 0, 3], nf.ExportPacket([other_tfs]).encode(), vlan=True),
+        udp_frame([10, 0, 0, 2], nf.ExportPacket([data]).encode()),
+        udp_frame([10, 0, 0, 2], b'not netflow', dport=53),
+        udp_frame([10, 0, 0, 3], nf.ExportPacket([other_data]).encode()),
+    ]
+
+
+@pytest.mark.parametrize('container', [pcap, pcapng])
+def test_payloads(frames, container):
+    payloads = list(nfp.iter_payloads(container(frames), ports=[2055]))
+
+    assert len(payloads) == 4
+    assert payloads[0][0] == b'\x0a\x00\x00\x02'
+    assert payloads[1][0] == b'\x0a\x00\x00\x03'
+
+
+@pytest.mark.parametrize('container', [pcap, pcapng])
+def test_records_scoped_by_exporter(frames, container):
+    records = list(nfp.RecordStream(io.BytesIO(container(frames)), ports=[2055]))
+
+    assert len(records) == 3
+    assert records[0]['l4_src_port'] == 21
+    assert records[1:] == [{'protocol': 6}, {'protocol': 17}]
+
+
+def test_invalid_datagrams_skipped(frames):
+    s = nfp.PacketStream(io.BytesIO(pcap(frames)))
+    packets = list(s)
+
+    assert len(packets) == 4
+    assert s.skipped['invalid'] == 1
+
+
+def test_not_a_capture():
+    with pytest.raises(ValueError):
+        nfp.iter_payloads(b'\x00' * 32)
+
+
+@pytest.mark.parametrize('container', [pcap, pcapng])
+@pytest.mark.parametrize('cut', [10, 16, 30])
+def test_truncated_frame_skipped(frames, container, cut):
+    payloads = list(nfp.iter_payloads(container(frames + [frames[2][:cut]]), ports=[2055]))
+
+    assert len(payloads) == 4
+
+
+def test_read_incrementally(frames):
+    class Source(io.BytesIO):
+        def read(self, size=-1):
+            assert size is not None and 0 <= size <= 2**16
+            return super(Source, self).read(size)
+
+    packets = list(nfp.PacketStream(Source(pcap(frames * 100)), ports=[2055]))
+
+    assert len(packets) == 400
+
+
+def test_ipfix_datagrams_skipped(frames):
+    ipfix = struct.pack("!HHIII", 10, 16, 0, 0, 0)
+    s = nfp.PacketStream(io.BytesIO(pcap(frames + [udp_frame([10, 0, 0, 2], ipfix)])), ports=[2055])
+    packets = list(s)
+
+    assert len(packets) == 4
+    assert s.skipped['invalid'] == 0
+    assert s.skipped[10] == 1
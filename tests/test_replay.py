@@ -0,0 +1,84 @@
+import io
+import socket
+
+import pytest
+
+import intake_netflow.v5 as nf5
+import intake_netflow.v9 as nf
+from intake_netflow.replay import load_packets, replay
+
+
+@pytest.fixture
+def capture(ipv4_template, v5_flows):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    flows = [[17, 3232235781, 21, 3232235782, 5000, 1024, 16, 512, 8]]
+    packets = [nf.ExportPacket([tfs], header=nf.Header(count=1, datetime=100)).encode()]
+    for i in range(10):
+        data = nf.DataFlowSet(ipv4_template.id, flows * (i + 1), tfs.templates)
+        packets.append(nf.ExportPacket([data], header=nf.Header(count=1, datetime=100)).encode())
+    packets.append(nf5.ExportPacket(v5_flows, header=nf5.Header(count=1, datetime=100,
+                                                                nanoseconds=50000000)).encode())
+    return packets
+
+
+@pytest.fixture
+def collector():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2**20)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(5)
+    yield sock
+    sock.close()
+
+
+def receive(sock, n):
+    return [sock.recv(65535) for _ in range(n)]
+
+
+def test_load_packets(capture):
+    packets = load_packets(io.BytesIO(b''.join(capture)))
+
+    assert [bytes(raw) for _, raw in packets] == capture
+    assert packets[0][0] == 100000
+    assert packets[-1][0] == 100050
+
+
+def test_load_packets_uptime(ipv4_template):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    headers = [
+        nf.Header(count=1, uptime=5000, datetime=100),
+        nf.Header(count=1, uptime=5250, datetime=100),
+        nf.Header(count=1, uptime=9000, datetime=100, source_id=1),
+        nf.Header(count=1, uptime=5900, datetime=101),
+        nf.Header(count=1, uptime=7200, datetime=102),
+        nf.Header(count=1, uptime=100, datetime=102),
+    ]
+    capture = b''.join(nf.ExportPacket([tfs], header=header).encode() for header in headers)
+
+    times = [when for when, _ in load_packets(io.BytesIO(capture))]
+    # Uptimes pace packets within a second; restarts fall back to the export time
+    assert times == [100000, 100250, 100000, 101000, 102300, 102000]
+
+
+@pytest.mark.parametrize('mode, kwargs', [
+    ('max', {}),
+    ('rate', {'rate': 1000}),
+    ('original', {'speed': 10}),
+])
+def test_replay_loopback(capture, collector, mode, kwargs):
+    packets = load_packets(io.BytesIO(b''.join(capture)))
+
+    stats = replay(packets, collector.getsockname(), mode, batch_size=4, **kwargs)
+
+    assert receive(collector, len(capture)) == capture
+    assert stats['packets'] == len(capture)
+    assert stats['bytes'] == sum(len(raw) for raw in capture)
+    if mode == 'rate':
+        assert stats['seconds'] >= (len(capture) - 1) / 1000.0
+
+
+def test_invalid_mode(collector):
+    with pytest.raises(ValueError):
+        replay([], collector.getsockname(), 'fast')
+    with pytest.raises(ValueError):
+        replay([], collector.getsockname(), 'rate')
@@ -1,4 +1,9 @@
+import gzip
 import os
+import struct
+
+import pandas as pd
+import pytest
 
 from intake_netflow.source import NetflowSource
 
@@ -25,8 +30,335 @@ def test_multiple():
 
     metadata = src.discover()
     assert metadata['npartitions'] == 2
+    assert metadata['shape'] == (102,)
+    assert metadata['dtype'].names[:3] == ('protocol', 'ipv4_src_addr', 'l4_src_port')
+    assert metadata['dtype']['in_bytes'] == 'u4'
 
     data = src.read()
     assert len(data) == 102
 
+    assert sum(src.count().values()) == 102
+    counts = src.count(by_file=True)
+    assert sorted(sum(c.values()) for c in counts.values()) == [2, 100]
+
+    src.close()
+
+
+def test_read_without_scan(monkeypatch):
+    import intake_netflow.dispatch as dispatch
+
+    scans = []
+    scan_schema = dispatch.scan_schema
+    monkeypatch.setattr(dispatch, 'scan_schema', lambda *args, **kwargs: scans.append(args) or
+                        scan_schema(*args, **kwargs))
+    src = NetflowSource(urlpath=multiple)
+    assert len(src.read()) == 102
+    assert scans == []
+
+    assert src.discover()['shape'] == (102,)
+    assert len(scans) == 2
+    assert len(src.read_tables()) == 1
+    assert len(scans) == 2
+
+
+def test_version5(tmpdir, v5_flows):
+    from intake_netflow.v5 import ExportPacket
+
+    path = str(tmpdir.join('v5.netflow'))
+    with open(path, 'wb') as f:
+        for _ in range(4):
+            f.write(ExportPacket(v5_flows).encode())
+
+    src = NetflowSource(urlpath=path, version=5)
+    data = src.read()
+    assert len(data) == 4
+    assert data[0]['ipv4_src_addr'] == 3232235781
+
     src.close()
+
+
+def test_sampling(tmpdir, v5_flows):
+    from intake_netflow.v5 import ExportPacket
+
+    path = str(tmpdir.join('v5.netflow'))
+    with open(path, 'wb') as f:
+        for _ in range(10):
+            f.write(ExportPacket(v5_flows).encode())
+
+    assert len(NetflowSource(urlpath=path, every_nth=3).read()) == 4
+    sampled = NetflowSource(urlpath=path, sample=0.5, seed=1).read()
+    assert sampled == NetflowSource(urlpath=path, sample=0.5, seed=1).read()
+    assert 0 < len(sampled) < 10
+
+    with pytest.raises(ValueError):
+        NetflowSource(urlpath=path, format='nfcapd', sample=0.5)
+
+
+def test_address_mode():
+    src = NetflowSource(urlpath=single, address='str')
+
+    data = src.read()
+    assert data[0]['ipv4_src_addr'] == '192.168.1.5'
+    assert data[0]['ipv4_dst_addr'] == '192.168.1.6'
+
+    src.close()
+
+
+@pytest.mark.parametrize('ext, compress', [
+    ('gz', lambda raw: gzip.compress(raw)),
+    ('zst', lambda raw: pytest.importorskip('zstandard').ZstdCompressor().compress(raw)),
+])
+def test_compressed(tmpdir, ext, compress):
+    with open(single, 'rb') as f:
+        raw = f.read()
+    path = str(tmpdir.join('2.netflow.' + ext))
+    with open(path, 'wb') as f:
+        f.write(compress(raw))
+
+    src = NetflowSource(urlpath=path)
+    data = src.read()
+    assert len(data) == 2
+
+    src.close()
+
+
+def test_pcap(tmpdir):
+    with open(single, 'rb') as f:
+        payload = f.read()
+    udp = struct.pack("!HHHH", 50000, 2055, 8 + len(payload), 0) + payload
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(udp), 0, 0, 64, 17, 0,
+                     b'\x0a\x00\x00\x02', b'\x0a\x00\x00\x01') + udp
+    raw = struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 101)
+    raw += struct.pack("<IIII", 0, 0, len(ip), len(ip)) + ip
+    path = str(tmpdir.join('collector.pcap'))
+    with open(path, 'wb') as f:
+        f.write(raw)
+
+    src = NetflowSource(urlpath=path, format='pcap', ports=[2055])
+    data = src.read()
+    assert len(data) == 2
+    assert [len(chunk) for chunk in src.read_chunked(chunksize=1)] == [1, 1]
+
+    src.close()
+
+
+def test_nfcapd(tmpdir):
+    from .test_nfcapd import flow_record, nfcapd_file
+
+    path = str(tmpdir.join('nfcapd.201804060730'))
+    with open(path, 'wb') as f:
+        f.write(nfcapd_file([[flow_record(1523000000, 1523000001)] * 3,
+                             [flow_record(1523000002, 1523000003)] * 2]))
+
+    src = NetflowSource(urlpath=path, format='nfcapd')
+
+    metadata = src.discover()
+    assert metadata['npartitions'] == 2
+    assert len(src.read_partition(1)) == 2
+
+    data = src.read()
+    assert len(data) == 5
+    assert [len(chunk) for chunk in src.iter_partition(0, chunksize=2)] == [2, 1]
+    assert [len(chunk) for chunk in src.read_chunked(chunksize=2)] == [2, 1, 2]
+
+    src.close()
+
+
+def test_dataframe(tmpdir, ipv4_template):
+    import intake_netflow.v9 as nf
+
+    template = ipv4_template
+    tfs = nf.TemplateFlowSet([template])
+    record = [17, 3232235781, 21, 3232235782, 5000, 1024, 16, 512, 8]
+    data = nf.DataFlowSet(template.id, [record], tfs.templates)
+    for i, datetime in enumerate([2000, 1000]):
+        with open(str(tmpdir.join('{}.netflow'.format(i))), 'wb') as f:
+            f.write(nf.ExportPacket([tfs, data], header=nf.Header(count=2, datetime=datetime)).encode())
+            f.write(nf.ExportPacket([data], header=nf.Header(count=1, datetime=datetime + 60)).encode())
+
+    src = NetflowSource(urlpath=str(tmpdir.join('*.netflow')), container='dataframe')
+    ddf = src.to_dask()
+    assert ddf.known_divisions
+    assert ddf.divisions[0] == pd.Timestamp(1000, unit='s')
+    window = ddf.loc[pd.Timestamp(2000, unit='s'):]
+    assert window.npartitions == 1
+    assert len(window.compute()) == 2
+    for i in range(ddf.npartitions):
+        part = ddf.get_partition(i).compute()
+        assert part.index.equals(src.read_partition(i).index)
+        assert part.index.equals(next(src.iter_partition(i)).index)
+
+    df = src.read()
+    assert len(df) == 4
+    assert df.index.is_monotonic_increasing
+    assert df['l4_src_port'].dtype == 'u2'
+
+
+def test_time_range(tmpdir, ipv4_template):
+    import intake_netflow.v9 as nf
+
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, [[17, 1, 21, 2, 5000, 1024, 16, 512, 8]], tfs.templates)
+    base = 1514903400  # 2018-01-02 14:30 UTC
+    for minute in (0, 5, 10):
+        name = 'flows-2018010214{:02d}.netflow'.format(30 + minute)
+        with open(str(tmpdir.join(name)), 'wb') as f:
+            for second in range(0, 300, 60):
+                header = nf.Header(count=2, datetime=base + minute * 60 + second)
+                f.write(nf.ExportPacket([tfs, data], header=header).encode())
+
+    src = NetflowSource(urlpath=str(tmpdir.join('*.netflow')),
+                        start='2018-01-02T14:36', end='2018-01-02T14:38')
+    data = src.read()
+    assert src.npartitions == 1
+    assert len(data) == 2
+
+    src = NetflowSource(urlpath=str(tmpdir.join('*.netflow')), start=base + 299)
+    assert src.discover()['npartitions'] == 2
+    assert len(src.read()) == 10
+    assert sum(src.count().values()) == 10
+
+    src = NetflowSource(urlpath=str(tmpdir.join('*.netflow')),
+                        start='2018-01-02T14:36', end='2018-01-02T14:38')
+    assert sum(src.count().values()) == len(src.read()) == 2
+
+
+def test_time_range_per_exporter(tmpdir, ipv4_template):
+    import intake_netflow.v9 as nf
+
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, [[17, 1, 21, 2, 5000, 1024, 16, 512, 8]], tfs.templates)
+    base = 1514764800  # 2018-01-01 00:00 UTC
+    for exporter in ('r1', 'r2'):
+        for minute in (0, 5):
+            path = tmpdir.mkdir(exporter) if minute == 0 else tmpdir.join(exporter)
+            with open(str(path.join('nfcapd.20180101000{}'.format(minute))), 'wb') as f:
+                for second in range(0, 300, 60):
+                    header = nf.Header(count=2, datetime=base + minute * 60 + second)
+                    f.write(nf.ExportPacket([tfs, data], header=header).encode())
+
+    src = NetflowSource(urlpath=str(tmpdir.join('*', 'nfcapd.*')),
+                        start='2018-01-01T00:01', end='2018-01-01T00:02')
+    assert src.discover()['npartitions'] == 2
+    assert len(src.read()) == 2
+
+
+def test_resync_corrupt_file(tmpdir, v5_flows):
+    from intake_netflow.v5 import ExportPacket
+
+    packet = ExportPacket(v5_flows).encode()
+    path = str(tmpdir.join('corrupt.netflow'))
+    with open(path, 'wb') as f:
+        f.write(packet + b'\xde\xad\xbe\xef' + packet + packet[:30])
+
+    assert len(NetflowSource(urlpath=path).read()) == 1
+    assert len(NetflowSource(urlpath=path, errors='resync').read()) == 2
+
+    with pytest.raises(ValueError):
+        NetflowSource(urlpath=path, format='pcap', errors='resync')
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'every_nth': 1}, {'container': 'dataframe'}])
+def test_truncated_last_packet(tmpdir, ipv4_template, kwargs):
+    import intake_netflow.v9 as nf
+
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    record = [17, 3232235781, 21, 3232235782, 5000, 1024, 16, 512, 8]
+    data = nf.DataFlowSet(ipv4_template.id, [record] * 30, tfs.templates)
+    packet = nf.ExportPacket([data]).encode()
+    path = str(tmpdir.join('truncated.netflow'))
+    with open(path, 'wb') as f:
+        f.write(nf.ExportPacket([tfs, data], header=nf.Header(count=2)).encode())
+        f.write(packet[:len(packet) // 2])
+
+    src = NetflowSource(urlpath=path, **kwargs)
+    assert src.discover()['shape'][0] == 30
+    assert sum(src.count().values()) == 30
+    assert len(src.read()) == 30
+
+
+def test_read_chunked(tmpdir, ipv4_template):
+    import intake_netflow.v9 as nf
+
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    record = [17, 3232235781, 21, 3232235782, 5000, 1024, 16, 512, 8]
+    data = nf.DataFlowSet(ipv4_template.id, [record] * 3, tfs.templates)
+    path = str(tmpdir.join('chunked.netflow'))
+    with open(path, 'wb') as f:
+        f.write(nf.ExportPacket([tfs, data], header=nf.Header(count=2)).encode())
+        for _ in range(3):
+            f.write(nf.ExportPacket([data]).encode())
+
+    src = NetflowSource(urlpath=path)
+    assert [len(chunk) for chunk in src.read_chunked(chunksize=5)] == [5, 5, 2]
+    assert [len(chunk) for chunk in src.iter_partition(0, chunksize=12)] == [12]
+
+    src = NetflowSource(urlpath=path, container='dataframe')
+    frames = list(src.read_chunked(chunksize=5))
+    assert [len(frame) for frame in frames] == [5, 5, 2]
+    assert list(frames[0].columns) == list(src.to_dask().columns)
+
+
+def test_read_tables(tmpdir, ipv4_template, v5_flows):
+    import intake_netflow.v5 as nf5
+    import intake_netflow.v9 as nf
+    from intake_netflow.frame import merge_tables
+
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    record = [17, 3232235781, 21, 3232235782, 5000, 1024, 16, 512, 8]
+    data = nf.DataFlowSet(ipv4_template.id, [record] * 2, tfs.templates)
+    path = str(tmpdir.join('mixed.netflow'))
+    with open(path, 'wb') as f:
+        f.write(nf.ExportPacket([tfs, data], header=nf.Header(count=2)).encode())
+        f.write(nf5.ExportPacket(v5_flows).encode())
+
+    tables = NetflowSource(urlpath=path).read_tables()
+    assert [len(table) for table in tables.values()] == [2, 1]
+    assert all(not table.isna().any().any() for table in tables.values())
+    assert len(merge_tables(tables)) == 3
+
+
+def test_categories(tmpdir, ipv4_template):
+    import intake_netflow.v9 as nf
+
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    for i, protocol in enumerate([6, 17]):
+        record = [protocol, 3232235781, 21, 3232235782, 5000, 1024, 16, 512, 8]
+        data = nf.DataFlowSet(ipv4_template.id, [record] * 2, tfs.templates)
+        with open(str(tmpdir.join('{}.netflow'.format(i))), 'wb') as f:
+            header = nf.Header(count=2, datetime=1000 * (i + 1))
+            f.write(nf.ExportPacket([tfs, data], header=header).encode())
+
+    src = NetflowSource(urlpath=str(tmpdir.join('*.netflow')), container='dataframe',
+                        categories=[nf.FieldType.PROTOCOL, 'L4_SRC_PORT'])
+    df = src.read()
+    assert df['protocol'].dtype == 'category'
+    assert sorted(df['protocol'].cat.categories) == [6, 17]
+    assert df['l4_src_port'].dtype == 'category'
+    assert df['l4_dst_port'].dtype == 'u2'
+
+    ddf = src.to_dask()
+    assert ddf['protocol'].dtype == 'category'
+    assert list(ddf['protocol'].compute()) == [6, 6, 17, 17]
+    assert all(frame['protocol'].dtype == 'category' for frame in src.read_chunked(chunksize=3))
+
+    table, = NetflowSource(urlpath=str(tmpdir.join('*.netflow')), container='dataframe',
+                           categories=['protocol']).read_tables().values()
+    assert sorted(table['protocol'].cat.categories) == [6, 17]
+
+    with pytest.raises(ValueError):
+        NetflowSource(urlpath=str(tmpdir.join('*.netflow')), categories=['protocol'])
+    with pytest.raises(ValueError):
+        NetflowSource(urlpath=str(tmpdir.join('*.netflow')), format='pcap', categories=['protocol'])
+
+    # Fields missing from the files are allowed, other names must be columns
+    urlpath = str(tmpdir.join('*.netflow'))
+    src = NetflowSource(urlpath=urlpath, container='dataframe', categories=['ipv6_src_addr'])
+    assert len(src.read()) == 4
+    src = NetflowSource(urlpath=urlpath, container='dataframe', address='uint64',
+                        categories=['ipv4_src_addr_hi'])
+    assert src.read()['ipv4_src_addr_hi'].dtype == 'category'
+    for categories in (['protocl'], ['ipv4_src_addr']):
+        with pytest.raises(ValueError):
+            NetflowSource(urlpath=urlpath, container='dataframe', address='uint64',
+                          categories=categories).discover()
@@ -62,3 +62,138 @@ def test_stream_multiple_packets(stream3):
 
     assert packets[0].header.version == 9
     assert len(packets[0].flowsets) == 1
+
+
+def test_header_is_frozen():
+    header = nf.Header(count=1)
+
+    with pytest.raises(AttributeError):
+        header.count = 2
+    assert not hasattr(header, '__dict__')
+
+
+def test_count(ipv4_template):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    records = [[17, 1, 21, 2, 5000, 1024, 16, 512, 8]] * 3
+    data = nf.DataFlowSet(ipv4_template.id, records, tfs.templates)
+    raw = nf.ExportPacket([tfs, data], header=nf.Header(count=2, source_id=7)).encode()
+    raw += nf.ExportPacket([data], header=nf.Header(count=1, source_id=7)).encode()
+
+    assert nf.PacketStream(io.BytesIO(raw)).count() == {(7, ipv4_template.id): 6}
+
+
+def test_header_scan(stream2, ipv4_template):
+    packets = list(nf.PacketStream(stream2, scan='headers'))
+
+    assert len(packets) == 1
+    flowsets = packets[0].flowsets
+    assert len(flowsets) == 33
+    assert all(isinstance(flowset, nf.SkippedFlowSet) for flowset in flowsets)
+    assert flowsets[0].id == 0
+    assert flowsets[0].length == len(nf.TemplateFlowSet([ipv4_template]))
+    assert flowsets[1].id == ipv4_template.id
+    assert flowsets[1].count == 0
+
+
+def test_sampled_records_keep_templates(ipv4_template):
+    from intake_netflow.utils import PacketSampler
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, [[17, 1, 21, 2, 5000, 1024, 16, 512, 8]], tfs.templates)
+    raw = nf.ExportPacket([data]).encode()
+    raw += nf.ExportPacket([tfs, data]).encode()
+    raw += nf.ExportPacket([data]).encode()
+
+    s = nf.RecordStream(io.BytesIO(raw), sampler=PacketSampler(every_nth=2))
+    records = list(s)
+
+    assert len(records) == 1
+    assert records[0]['l4_src_port'] == 21
+
+
+def test_follow_growing_file(tmpdir, ipv4_template):
+    import threading
+
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, [[17, 1, 21, 2, 5000, 1024, 16, 512, 8]], tfs.templates)
+    first = nf.ExportPacket([tfs, data]).encode()
+    second = nf.ExportPacket([data]).encode()
+    path = str(tmpdir.join('growing.netflow'))
+    with open(path, 'wb') as f:
+        f.write(first + second[:10])
+
+    def append():
+        with open(path, 'ab') as f:
+            f.write(second[10:])
+
+    writer = threading.Timer(0.1, append)
+    writer.start()
+    with open(path, 'rb') as f:
+        s = nf.RecordStream(f, follow=True, poll_interval=0.01, timeout=0.5)
+        records = list(s)
+        assert s.offset == len(first) + len(second)
+    writer.join()
+
+    assert len(records) == 2
+
+
+def test_partial_packet_without_follow(ipv4_template):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    raw = nf.ExportPacket([tfs]).encode()
+    s = nf.PacketStream(io.BytesIO(raw + raw[:-1]))
+
+    assert len(list(s)) == 1
+    assert s.offset == len(raw)
+
+
+def test_time_window_keeps_templates(ipv4_template):
+    from intake_netflow.utils import TimeWindow
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, [[17, 1, 21, 2, 5000, 1024, 16, 512, 8]], tfs.templates)
+    raw = nf.ExportPacket([tfs, data], header=nf.Header(count=2, datetime=100)).encode()
+    raw += nf.ExportPacket([data], header=nf.Header(count=1, datetime=200)).encode()
+    raw += nf.ExportPacket([data], header=nf.Header(count=1, datetime=300)).encode()
+
+    s = nf.RecordStream(io.BytesIO(raw), sampler=TimeWindow(start=150000, end=300000))
+
+    assert len(list(s)) == 1
+
+
+def test_resync_skips_corrupt_bytes(ipv4_template):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    data = nf.DataFlowSet(ipv4_template.id, [[17, 1, 21, 2, 5000, 1024, 16, 512, 8]], tfs.templates)
+    good = nf.ExportPacket([data]).encode()
+    garbage = b'\xff' * 13
+    raw = nf.ExportPacket([tfs]).encode() + good + garbage + good + good[:-5]
+
+    s = nf.RecordStream(io.BytesIO(raw), errors='resync')
+
+    assert len(list(s)) == 2
+    assert s.stats['packets'] == 3
+    assert s.stats['resyncs'] == 2
+    assert s.stats['skipped_bytes'] == len(garbage) + len(good) - 5
+    assert s.offset == len(raw)
+
+
+def test_errors_stop_and_raise(ipv4_template):
+    tfs = nf.TemplateFlowSet([ipv4_template])
+    raw = nf.ExportPacket([tfs]).encode()
+    # A data flowset shorter than its own header
+    corrupt = raw + nf.Header(count=1).encode() + b'\x01\x00\x00\x02'
+
+    s = nf.PacketStream(io.BytesIO(corrupt))
+    assert len(list(s)) == 1
+    assert s.stats['errors'] == 1
+
+    s = nf.PacketStream(io.BytesIO(corrupt), errors='raise')
+    s.next()
+    with pytest.raises(ValueError):
+        s.next()
+
+    s = nf.PacketStream(io.BytesIO(raw), errors='raise')
+    assert len(list(s)) == 1
+    assert s.stats['errors'] == 0
+
+    with pytest.raises(ValueError):
+        nf.PacketStream(io.BytesIO(raw), errors='ignore')
+    with pytest.raises(ValueError):
+        nf.PacketStream(io.BytesIO(raw), follow=True, errors='resync')
@@ -1,6 +1,7 @@
 import io
 
-from intake_netflow.v9 import FieldType, TemplateField, TemplateFlowSet, TemplateRecord
+from intake_netflow.v9 import (FieldType, TemplateField, TemplateFlowSet, TemplateRecord,
+                               UnknownFieldType, field_type)
 
 
 def test_field_roundtrip():
@@ -11,6 +12,13 @@ def test_field_roundtrip():
     assert expected == given
 
 
+def test_field_struct():
+    assert TemplateField(FieldType.L4_SRC_PORT, 2).struct.format in ('!H', b'!H')
+    assert TemplateField(FieldType.IN_SRC_MAC, 6).struct.size == 6
+    assert TemplateField(FieldType.MPLS_TOP_LABEL_TYPE, 3).struct.unpack(b'\x01\x02\x03') == (1, 2, 3)
+    assert TemplateField(field_type(40000), 16).struct.size == 16
+
+
 def test_record_empty_roundtrip():
     expected = TemplateRecord(id=256)
 
@@ -45,3 +53,38 @@ def test_flowset_nonempty_roundtrip():
     given = TemplateFlowSet.decode(io.BytesIO(expected.encode()))
 
     assert expected == given
+
+
+def test_unknown_field_roundtrip():
+    expected = TemplateField(field_type(43), 4)
+
+    given = TemplateField.decode(io.BytesIO(expected.encode()))
+
+    assert expected == given
+    assert isinstance(given.type, UnknownFieldType)
+    assert given.type.name == 'FIELD_43'
+    assert field_type(4) is FieldType.PROTOCOL
+
+
+def test_record_multiple_fields_roundtrip():
+    fields = [TemplateField(FieldType.PROTOCOL, 1), TemplateField(field_type(40001), 6)]
+    expected = TemplateRecord(id=256, fields=fields)
+
+    given = TemplateRecord.decode(io.BytesIO(expected.encode()))
+
+    assert expected == given
+
+
+def test_flowset_multiple_templates_roundtrip():
+    templates = [TemplateRecord(id=256, fields=[TemplateField(FieldType.PROTOCOL, 1)]),
+                 TemplateRecord(id=257, fields=[TemplateField(FieldType.IN_BYTES, 8),
+                                                TemplateField(FieldType.IN_PKTS, 8)])]
+    expected = TemplateFlowSet(templates)
+    raw = expected.encode()
+    source = io.BytesIO(raw + b'\x00\x00')
+
+    given = TemplateFlowSet.decode(source)
+
+    assert expected == given
+    assert len(expected) == len(raw) == 24
+    assert source.tell() == len(raw)
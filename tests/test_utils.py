@@ -0,0 +1,110 @@
+import datetime
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from intake_netflow.utils import (BlockReader, PacketSampler, TimeWindow, filename_time, peek,
+                                  skip, to_milliseconds)
+
+
+@pytest.fixture
+def data():
+    return bytes(bytearray(range(256))) * 64
+
+
+def test_block_reader_read(data):
+    with BlockReader(io.BytesIO(data), block_size=100) as f:
+        chunks = [f.read(7) for _ in range(10)]
+        rest = f.read()
+
+    assert b''.join(chunks) + rest == data
+
+
+def test_block_reader_peek_and_tell(data):
+    with BlockReader(io.BytesIO(data), block_size=3) as f:
+        f.read(2)
+        assert peek(f, 5) == data[2:7]
+        assert f.tell() == 2
+        assert f.read(5) == data[2:7]
+
+
+def test_block_reader_seek(data):
+    with BlockReader(io.BytesIO(data), block_size=50) as f:
+        f.read(10)
+        f.seek(1000)
+        assert f.read(4) == data[1000:1004]
+        f.seek(-4, io.SEEK_CUR)
+        assert f.read(4) == data[1000:1004]
+        f.seek(len(data))
+        assert f.read(1) == b''
+
+        with pytest.raises(io.UnsupportedOperation):
+            f.seek(0)
+        with pytest.raises(EOFError):
+            f.seek(len(data) + 10)
+
+
+@pytest.mark.parametrize('wrap', [io.BytesIO, lambda data: BlockReader(io.BytesIO(data))])
+def test_skip_past_end(data, wrap):
+    f = wrap(data)
+    skip(f, len(data) - 1)
+    assert f.read(1) == data[-1:]
+
+    f = wrap(data)
+    with pytest.raises(EOFError):
+        skip(f, len(data) + 1)
+
+
+def test_block_reader_error():
+    class Broken(io.RawIOBase):
+        def read(self, size=-1):
+            raise IOError("broken")
+
+    with BlockReader(Broken()) as f:
+        with pytest.raises(IOError):
+            f.read(1)
+
+
+def test_packet_sampler():
+    every = PacketSampler(every_nth=3)
+    assert [every() for _ in range(7)] == [True, False, False, True, False, False, True]
+
+    a, b = PacketSampler(0.5, seed=1), PacketSampler(0.5, seed=1)
+    choices = [a() for _ in range(100)]
+    assert choices == [b() for _ in range(100)]
+    assert 0 < choices.count(True) < 100
+
+    with pytest.raises(ValueError):
+        PacketSampler(0.5, every_nth=2)
+    with pytest.raises(ValueError):
+        PacketSampler(0)
+
+
+def test_time_window():
+    from intake_netflow.v5 import Header
+
+    window = TimeWindow(start=1000000, end=2000000, sampler=PacketSampler(every_nth=2))
+    headers = [Header(datetime=t, nanoseconds=5000000) for t in (999, 1000, 1500, 1600, 2000)]
+
+    assert [window(header) for header in headers] == [False, True, False, True, False]
+
+
+def test_to_milliseconds():
+    expected = 1514903400000
+    assert to_milliseconds(1514903400) == expected
+    assert to_milliseconds(np.int64(1514903400)) == expected
+    assert to_milliseconds(np.float64(1514903400.5)) == expected + 500
+    assert to_milliseconds('2018-01-02T14:30') == expected
+    assert to_milliseconds('2018-01-02T14:30:00Z') == expected
+    assert to_milliseconds('2018-01-02T15:30:00+01:00') == expected
+    assert to_milliseconds(np.datetime64('2018-01-02T14:30')) == expected
+    assert to_milliseconds(datetime.datetime(2018, 1, 2, 14, 30)) == expected
+    assert to_milliseconds(pd.Timestamp('2018-01-02T09:30', tz='US/Eastern')) == expected
+
+
+def test_filename_time():
+    assert filename_time('/data/nfcapd.201801021430') == to_milliseconds('2018-01-02T14:30')
+    assert filename_time('flows-20180102143005.netflow.gz') == to_milliseconds(1514903405)
+    assert filename_time('2.netflow') is None
@@ -0,0 +1,89 @@
+import datetime
+import io
+
+import numpy as np
+import pytest
+
+import intake_netflow.v5 as nf5
+
+
+@pytest.fixture
+def ipv4_flows():
+    # Fields ordered as nf5.record_dtype.
+    return [
+        [3232235781, 3232235782, 0, 1, 2, 16, 1024, 1000, 2000, 21, 5000, 24, 6, 0, 0, 0, 24, 24],
+        [3232235782, 3232235781, 0, 2, 1, 8, 512, 1500, 2500, 5000, 21, 16, 6, 0, 0, 0, 24, 24]]
+
+
+def test_header_roundtrip():
+    expected = nf5.Header(count=3, uptime=1234, datetime=1523000000, nanoseconds=5,
+                          sequence=42, engine_type=1, engine_id=2, sampling_interval=100)
+
+    given = nf5.Header.decode(io.BytesIO(expected.encode()))
+
+    assert expected == given
+    assert len(expected.encode()) == 24
+
+
+def test_packet_roundtrip(ipv4_flows):
+    expected = nf5.ExportPacket(ipv4_flows)
+    raw = expected.encode()
+
+    assert len(raw) == 24 + 48 * len(ipv4_flows)
+
+    given = nf5.ExportPacket.decode(io.BytesIO(raw))
+
+    assert given.header == expected.header
+    assert np.array_equal(given.records, expected.records)
+    assert given.records.tolist() == [tuple(flow) for flow in ipv4_flows]
+
+
+def test_record_stream(ipv4_flows):
+    raw = b''.join(nf5.ExportPacket(ipv4_flows).encode() for _ in range(3))
+
+    records = list(nf5.RecordStream(io.BytesIO(raw)))
+
+    assert len(records) == 6
+    assert records[0]['ipv4_src_addr'] == 3232235781
+    assert records[0]['l4_dst_port'] == 5000
+    assert records[1]['in_bytes'] == 512
+    assert set(records[0]) == set(nf5.record_dtype.names)
+
+
+def test_empty_packet():
+    raw = nf5.ExportPacket([]).encode()
+
+    packets = list(nf5.PacketStream(io.BytesIO(raw)))
+
+    assert len(packets) == 1
+    assert len(packets[0].records) == 0
+
+
+def test_record_stream_timestamps(ipv4_flows):
+    header = nf5.Header(count=2, uptime=3000, datetime=1523000000, nanoseconds=500000000)
+    raw = nf5.ExportPacket(ipv4_flows, header=header).encode()
+
+    records = list(nf5.RecordStream(io.BytesIO(raw), timestamps=True))
+
+    assert records[0]['flow_start'] == datetime.datetime(2018, 4, 6, 7, 33, 18, 500000)
+    assert records[0]['flow_end'] == datetime.datetime(2018, 4, 6, 7, 33, 19, 500000)
+    assert records[1]['flow_duration'] == datetime.timedelta(seconds=1)
+
+
+def test_header_scan(ipv4_flows):
+    raw = nf5.ExportPacket(ipv4_flows).encode() * 2
+    packets = list(nf5.PacketStream(io.BytesIO(raw), scan='headers'))
+
+    assert [p.header.count for p in packets] == [len(ipv4_flows)] * 2
+    assert all(len(p.records) == 0 for p in packets)
+
+
+def test_resync(ipv4_flows):
+    packet = nf5.ExportPacket(ipv4_flows).encode()
+    raw = packet + b'\x00\x05\x00\xff' + b'\x00' * 40 + packet
+
+    s = nf5.RecordStream(io.BytesIO(raw), errors='resync')
+
+    assert len(list(s)) == 4
+    assert s.stats['resyncs'] == 1
+    assert s.stats['skipped_bytes'] == 44
@@ -0,0 +1,128 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import intake_netflow.dispatch as nfd
+import intake_netflow.v9 as nf
+from intake_netflow.writer import PacketWriter, write_packets
+
+
+@pytest.fixture
+def frame():
+    n = 1000
+    return pd.DataFrame({
+        'protocol': np.full(n, 6, dtype='u1'),
+        'ipv4_src_addr': np.arange(n, dtype='u4'),
+        'l4_src_port': np.full(n, 21, dtype='u2'),
+        'ipv4_dst_addr': np.arange(n, dtype='u4')[::-1],
+        'l4_dst_port': np.full(n, 5000, dtype='u2'),
+        'in_bytes': np.arange(n, dtype='u4') * 10,
+        'in_pkts': np.ones(n, dtype='u4'),
+        'out_bytes': np.zeros(n, dtype='u4'),
+        'out_pkts': np.zeros(n, dtype='u4'),
+    }, index=pd.DatetimeIndex(np.repeat(np.array(['2018-01-02T14:30:00', '2018-01-02T14:30:05'],
+                                                 dtype='datetime64[ns]'), n // 2),
+                              name='export_time'))
+
+
+def test_roundtrip(frame, ipv4_template):
+    sink = io.BytesIO()
+    writer = PacketWriter(sink, ipv4_template, mtu=1500, template_interval=5)
+    writer.write(frame)
+    writer.flush()
+    raw = sink.getvalue()
+
+    packets = list(nf.PacketStream(io.BytesIO(raw)))
+    sizes = [len(p.header.encode()) + sum(len(fs) for fs in p.flowsets) for p in packets]
+    assert max(sizes) <= 1500 - 28
+    assert [p.header.sequence for p in packets] == list(range(len(packets)))
+
+    data = [p for p in packets if isinstance(p.flowsets[0], nf.DataFlowSet)]
+    templates = [i for i, p in enumerate(packets) if isinstance(p.flowsets[0], nf.TemplateFlowSet)]
+    assert templates[0] == 0
+    assert len(templates) == -(-len(data) // 5)
+    assert {p.header.datetime for p in data} == {1514903400, 1514903405}
+
+    records = list(nf.RecordStream(io.BytesIO(raw)))
+    assert len(records) == len(frame)
+    assert [r['ipv4_src_addr'] for r in records] == frame['ipv4_src_addr'].tolist()
+    assert records[-1]['in_bytes'] == 9990
+
+
+def test_write_empty(frame, ipv4_template):
+    sink = io.BytesIO()
+    with PacketWriter(sink, ipv4_template) as writer:
+        writer.write(frame.iloc[:0])
+        writer.write(dict((name, []) for name in frame.columns))
+        writer.flush()
+        assert sink.getvalue() == b''
+        assert writer.sequence == 0
+
+
+def test_odd_widths_and_bytes():
+    template = nf.TemplateRecord(1026, [
+        nf.TemplateField(nf.FieldType.MPLS_TOP_LABEL_TYPE, 3),
+        nf.TemplateField(nf.FieldType.IPV6_SRC_ADDR, 16)])
+    addresses = [bytes(range(16)), bytes(16)]
+    sink = io.BytesIO()
+    with PacketWriter(sink, template) as writer:
+        writer.write({'mpls_top_label_type': [0x123456, 1], 'ipv6_src_addr': addresses})
+        writer.flush()
+        raw = sink.getvalue()
+
+    records = list(nf.RecordStream(io.BytesIO(raw)))
+    assert [r['mpls_top_label_type'] for r in records] == [0x123456, 1]
+    assert [bytes(r['ipv6_src_addr']) for r in records] == addresses
+
+
+def test_string_fields():
+    template = nf.TemplateRecord(1027, [
+        nf.TemplateField(nf.FieldType.INPUT_SNMP, 2),
+        nf.TemplateField(nf.FieldType.IF_NAME, 8)])
+    sink = io.BytesIO()
+    with PacketWriter(sink, template) as writer:
+        writer.write({'input_snmp': [1, 2, 3], 'if_name': [b'eth0', b'ge-0/0/1', b'']})
+        writer.flush()
+        raw = sink.getvalue()
+
+    records = list(nf.RecordStream(io.BytesIO(raw)))
+    names = [r['if_name'] for r in records]
+    assert names == [b'eth0', b'ge-0/0/1', b'']
+
+    # Decoded records are written back unchanged
+    sink = io.BytesIO()
+    with PacketWriter(sink, template) as writer:
+        writer.write(pd.DataFrame(records))
+        writer.flush()
+        assert [r['if_name'] for r in nf.RecordStream(io.BytesIO(sink.getvalue()))] == names
+
+
+def test_write_packets(tmpdir, frame, ipv4_template):
+    path = str(tmpdir.join('extract.netflow'))
+
+    write_packets(path, frame.reset_index(drop=True), ipv4_template, mtu=576)
+
+    with open(path, 'rb') as f:
+        assert sum(nfd.count_records(f).values()) == len(frame)
+
+
+def test_arrow_table(frame, ipv4_template):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        pytest.skip("pyarrow is not available")
+    sink = io.BytesIO()
+    writer = PacketWriter(sink, ipv4_template)
+    writer.write(pa.Table.from_pandas(frame.reset_index()))
+    writer.flush()
+
+    assert len(list(nf.RecordStream(io.BytesIO(sink.getvalue())))) == len(frame)
+
+
+def test_invalid_options(ipv4_template):
+    with pytest.raises(ValueError):
+        PacketWriter(io.BytesIO(), ipv4_template, mtu=60)
+    with pytest.raises(ValueError):
+        PacketWriter(io.BytesIO(), ipv4_template).write({'protocol': [6]})